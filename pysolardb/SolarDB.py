@@ -2,16 +2,40 @@ import requests
 import json
 import os
 import logging
+import threading
+import time
 import outdated
 import pandas as pd
 from io import StringIO
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from . import sample
+from . import solar
+from . import arrow
+from .qc import QualityControl
+from .utils import parseDate, parseDuration, formatDate
+from .concurrency import AdaptiveLimiter
+from .session import SessionStore
 from urllib3.exceptions import InsecureRequestWarning
 
+## Sensors whose last value is more recent than this margin when the coverage index is
+## built are considered live: their coverage is not bounded above
+LIVE_MARGIN = pd.Timedelta(days=1)
+
 
 class SolarDB():
 
-    def __init__(self, token: str = None, logging_level: int = 10, apiURL: str = "solardb.univ-reunion.fr", skipSSL: bool = False):
+    def __init__(
+            self,
+            token: str = None,
+            logging_level: int = 10,
+            apiURL: str = "solardb.univ-reunion.fr",
+            skipSSL: bool = False,
+            maxWorkers: int = 8,
+            rateLimit: float = None,
+            sessionStore: str = None,
+            coverageTTL: float = 3600
+    ):
         self.logger = logging.getLogger(__name__)
         self.setLoggerLevel(logging_level)
         self.checkIfOutdated()
@@ -21,6 +45,17 @@ class SolarDB():
         if skipSSL:
             requests.packages.urllib3.disable_warnings(category=InsecureRequestWarning)
         self.__cookies = None
+        self.__token = None
+        ## Optional session cookies shared between processes, refreshed when they expire
+        self.__apiURL = apiURL
+        self.__sessions = SessionStore(sessionStore) if sessionStore is not None else None
+        self.__refreshLock = threading.Lock()
+        ## Coverage index built from getBounds, keyed by (sites, sensor_types, sensors), with
+        ## the time at which each entry was built
+        self.__coverage = {}
+        self.__coverageTTL = coverageTTL
+        ## Adaptive concurrency control shared by all the parallel data paths
+        self.limiter = AdaptiveLimiter(maxLimit=maxWorkers, rateLimit=rateLimit)
         ## Automatically logs in SolarDB if the token is saved in the '~/.bashrc' file
         if token is None:
             token = os.environ.get('SolarDBToken')
@@ -28,14 +63,18 @@ class SolarDB():
 
         ## Methods to log in SolarDB----------------------------------------------------------
 
-    def login(self, token: str):
+    def login(self, token: str, refresh: bool = False):
         """
-        Gives access of SolarDB
+        Gives access of SolarDB. If a session store was given to the constructor, the
+        session saved by another process is reused instead of logging in again.
 
         Parameters
         ----------
         token : str
             This string is used as a key to log in SolarDB.
+        refresh : bool (OPTIONAL)
+            This boolean, which is false by default, forces a new login even if a session
+            is saved in the session store.
 
         Raises
         ------
@@ -52,9 +91,18 @@ class SolarDB():
 
         try:
             if token is not None:
+                self.__token = token
+                if self.__sessions is not None and not refresh:
+                    cookies = self.__sessions.load(SessionStore.key(self.__apiURL, token))
+                    if cookies is not None:
+                        self.__cookies = requests.utils.cookiejar_from_dict(cookies)
+                        self.logger.debug("Session restored from the session store")
+                        return
                 res = requests.get(self.__baseURL + "login?token=" + token, verify=self.__verify)
                 res.raise_for_status()
                 self.__cookies = res.cookies
+                if self.__sessions is not None:
+                    self.__sessions.save(SessionStore.key(self.__apiURL, token), requests.utils.dict_from_cookiejar(res.cookies))
                 self.logger.debug(json.loads(res.content)["message"])
             else:
                 self.logger.info("You will need to use your token to log in SolarDB")
@@ -67,6 +115,31 @@ class SolarDB():
         except requests.exceptions.RequestException as err:
             self.logger.warning("login -> Request Error:\n%s\n", err)
 
+    def __refreshSession(self, expired):
+        ## Called when the cookies `expired` were rejected: another thread or process may
+        ## already have logged in again, otherwise a new login is performed
+        with self.__refreshLock:
+            if self.__cookies is not expired or self.__token is None:
+                return
+            if self.__sessions is not None:
+                cookies = self.__sessions.load(SessionStore.key(self.__apiURL, self.__token))
+                if cookies is not None and cookies != requests.utils.dict_from_cookiejar(expired or {}):
+                    self.__cookies = requests.utils.cookiejar_from_dict(cookies)
+                    self.logger.debug("Session restored from the session store")
+                    return
+            self.logger.debug("The session expired, logging in again")
+            self.login(self.__token, refresh=True)
+
+    def __get(self, query: str):
+        ## Sends a request with the session cookies, logging in again once if they expired
+        cookies = self.__cookies
+        res = requests.get(query, cookies=cookies, verify=self.__verify)
+        if res.status_code in (401, 403) and self.__token is not None:
+            self.__refreshSession(cookies)
+            cookies = self.__cookies
+            res = requests.get(query, cookies=cookies, verify=self.__verify)
+        return res
+
     def register(self, email: str):
         """
         Sends a token via email.
@@ -126,7 +199,11 @@ class SolarDB():
 
         try:
             logged_in = False
-            res = requests.get(self.__baseURL + "status", cookies=self.__cookies, verify=self.__verify)
+            cookies = self.__cookies
+            res = requests.get(self.__baseURL + "status", cookies=cookies, verify=self.__verify)
+            if json.loads(res.content)["message"] != "User connected" and self.__token is not None:
+                self.__refreshSession(cookies)
+                res = requests.get(self.__baseURL + "status", cookies=self.__cookies, verify=self.__verify)
             if json.loads(res.content)["message"] == "User connected":
                 logged_in = True
             self.logger.info(json.loads(res.content)["message"])
@@ -160,6 +237,9 @@ class SolarDB():
             res.raise_for_status()
             self.logger.debug(json.loads(res.content)["message"])
             self.__cookies = None
+            if self.__sessions is not None and self.__token is not None:
+                self.__sessions.clear(SessionStore.key(self.__apiURL, self.__token))
+            self.__token = None
         except requests.exceptions.HTTPError:
             self.logger.warning("logout -> HTTP Error:\n%s\n", json.loads(res.content)["message"])
         except requests.exceptions.ConnectionError as errc:
@@ -194,7 +274,7 @@ class SolarDB():
 
         sites = []
         try:
-            res = requests.get(self.__baseURL + "data/sites", cookies=self.__cookies, verify=self.__verify)
+            res = self.__get(self.__baseURL + "data/sites")
             res.raise_for_status()
             for i in range(len(json.loads(res.content)["data"])):
                 sites.append(json.loads(res.content)["data"][i])
@@ -232,7 +312,7 @@ class SolarDB():
 
         sensor_types = []
         try:
-            res = requests.get(self.__baseURL + "data/types", cookies=self.__cookies, verify=self.__verify)
+            res = self.__get(self.__baseURL + "data/types")
             res.raise_for_status()
             for i in range(len(json.loads(res.content)["data"])):
                 sensor_types.append(json.loads(res.content)["data"][i])
@@ -285,7 +365,7 @@ class SolarDB():
         if args != "":
             query += "?" + args
         try:
-            res = requests.get(query, cookies=self.__cookies, verify=self.__verify)
+            res = self.__get(query)
             res.raise_for_status()
             sensors = json.loads(res.content)["data"]
             self.logger.debug("All sensors successfully extracted from SolarDB")
@@ -307,12 +387,17 @@ class SolarDB():
             start: str = None,
             stop: str = None,
             aggrFn: str = None,
-            aggrEvery: str = None
+            aggrEvery: str = None,
+            useCoverage: bool = False,
+            asArrow: bool = False
     ):
         """
         Extracts data associated to at least one site, sensor and/or type. The user can
         choose the time period on which the extraction is set (set on the last 24h by
         default) and define an aggregation for a better analysis.
+        When useCoverage is set, the request is first checked against the coverage index
+        (see getCoverage): it is clipped to the active period of the sensors and skipped
+        altogether if none of them has data in the requested time period.
 
         Parameters
         ----------
@@ -345,6 +430,12 @@ class SolarDB():
         aggrEvery : str (OPTIONAL)
             This string represents the period for the aggregation. It follows the duration
             unit format defined previously.
+        useCoverage : bool (OPTIONAL)
+            This boolean, which is false by default, enables the coverage check before
+            sending the request.
+        asArrow : bool (OPTIONAL)
+            This boolean, which is false by default, returns the data as a pyarrow Table
+            (see arrow.dataToArrow) instead of a dictionary. It requires pyarrow.
 
         Returns
         -------
@@ -358,6 +449,8 @@ class SolarDB():
                     }
                 }
             }
+            or a pyarrow Table with the columns site, sensor, time and value if asArrow
+            is set.
 
         Raises
         ------
@@ -371,6 +464,14 @@ class SolarDB():
         RequestException
             In case an error that is unaccounted for happens
         """
+        if asArrow:
+            arrow.requireArrow()
+        if useCoverage:
+            clipped = self.clipToCoverage(sites, sensor_types, sensors, start, stop)
+            if clipped is None:
+                self.logger.info("There is no data for this particular request")
+                return arrow.dataToArrow({}) if asArrow else {}
+            sensors, start, stop = clipped
         query = self.__baseURL + "data/json"
         args = ""
         if sites is not None:
@@ -391,13 +492,15 @@ class SolarDB():
             query += "?" + args
 
         try:
-            res = requests.get(query, cookies=self.__cookies, verify=self.__verify)
+            res = self.__get(query)
             res.raise_for_status()
             data = json.loads(res.content)["data"]
             if data:
                 self.logger.debug("Data successfully recovered")
             else:
                 self.logger.info("There is no data for this particular request")
+            if asArrow:
+                return arrow.dataToArrow(data)
             return data
         except requests.exceptions.HTTPError:
             self.logger.warning("getData -> HTTP Error:\n%s\n", json.loads(res.content)["message"])
@@ -408,6 +511,271 @@ class SolarDB():
         except requests.exceptions.RequestException as err:
             self.logger.warning("getData -> Request Error:\n%s\n", err)
 
+    def getBulkData(
+            self,
+            sites: list = None,
+            sensor_types: list = None,
+            sensors: list = None,
+            start: str = None,
+            stop: str = None,
+            aggrFn: str = None,
+            aggrEvery: str = None,
+            useCoverage: bool = False,
+            asArrow: bool = False
+    ):
+        """
+        Extracts data like getData, but splits the request per site (or per sensor, or per
+        type when no sites are given) and sends the pieces in parallel. The number of
+        requests in flight is adapted to the latency and errors observed on SolarDB (see
+        AdaptiveLimiter), within the maxWorkers and rateLimit given to the constructor.
+
+        Parameters
+        ----------
+        sites : list
+            This list is used to specify the sites for which we will search the data.
+        sensor_types : list
+            This list is used to specify sensor types used to recover the data.
+        sensors : list
+            This list is used to specify the sensors used to recover the data.
+        start : str (OPTIONAL)
+            This string specifies the starting date for the data recovery (see getData).
+        stop : str (OPTIONAL)
+            This string specifies the ending date for the data recovery (see getData).
+        aggrFn : str (OPTIONAL)
+            This string represents the function to apply for the aggregation (see getData).
+        aggrEvery : str (OPTIONAL)
+            This string represents the period for the aggregation (see getData).
+        useCoverage : bool (OPTIONAL)
+            This boolean, which is false by default, enables the coverage check before
+            sending each request.
+        asArrow : bool (OPTIONAL)
+            This boolean, which is false by default, returns the data as a pyarrow Table
+            (see arrow.dataToArrow). It requires pyarrow.
+
+        Returns
+        -------
+            A dictionary containing the data per site and sensor, structured as the result
+            of getData, or a pyarrow Table if asArrow is set. The pieces that could not be
+            recovered are missing from it.
+        """
+        if asArrow:
+            arrow.requireArrow()
+        if sites is not None:
+            pieces = [dict(sites=[site], sensor_types=sensor_types, sensors=sensors) for site in sites]
+        elif sensors is not None:
+            pieces = [dict(sensor_types=sensor_types, sensors=[sensor]) for sensor in sensors]
+        elif sensor_types is not None:
+            pieces = [dict(sensor_types=[sensor_type]) for sensor_type in sensor_types]
+        else:
+            pieces = [dict()]
+
+        data = {}
+        with ThreadPoolExecutor(max_workers=self.limiter.maxLimit) as executor:
+            futures = [
+                executor.submit(
+                    self.limiter.run, self.getData, start=start, stop=stop, aggrFn=aggrFn,
+                    aggrEvery=aggrEvery, useCoverage=useCoverage, **piece
+                )
+                for piece in pieces
+            ]
+            for piece, future in zip(pieces, futures):
+                result = future.result()
+                if result is None:
+                    self.logger.warning("getBulkData -> Unable to recover the data for %s", piece)
+                    continue
+                for site in result:
+                    data.setdefault(site, {}).update(result[site])
+        if data:
+            self.logger.debug("Bulk data successfully recovered")
+        if asArrow:
+            return arrow.dataToArrow(data)
+        return data
+
+    def iterData(
+            self,
+            sites: list = None,
+            sensor_types: list = None,
+            sensors: list = None,
+            start: str = None,
+            stop: str = None,
+            window: str = "1mo",
+            prefetch: int = 2,
+            maxBytes: int = None,
+            aggrFn: str = None,
+            aggrEvery: str = None,
+            useCoverage: bool = False
+    ):
+        """
+        Iterates over consecutive time windows of the data associated to at least one site,
+        sensor and/or type. The next windows are downloaded in the background while the
+        current one is processed.
+
+        Parameters
+        ----------
+        sites : list
+            This list is used to specify the sites for which we will search the data.
+        sensor_types : list
+            This list is used to specify sensor types used to recover the data.
+        sensors : list
+            This list is used to specify the sensors used to recover the data.
+        start : str
+            This string specifies the starting date of the first window (see getData).
+        stop : str (OPTIONAL)
+            This string specifies the ending date of the last window (set on now by default).
+        window : str (OPTIONAL)
+            This string is the length of each window. It follows the duration unit format
+            (one month by default).
+        prefetch : int (OPTIONAL)
+            This integer is the number of windows downloaded ahead of the current one
+            (2 by default).
+        maxBytes : int (OPTIONAL)
+            This integer is the approximate memory budget, in bytes, of the windows waiting
+            to be consumed. No new window is requested while it is exceeded.
+        aggrFn : str (OPTIONAL)
+            This string represents the function to apply for the aggregation (see getData).
+        aggrEvery : str (OPTIONAL)
+            This string represents the period for the aggregation (see getData).
+        useCoverage : bool (OPTIONAL)
+            This boolean, which is false by default, enables the coverage check before
+            sending each request.
+
+        Returns
+        -------
+            A generator of (start, stop, data) tuples, where start and stop are the RFC3339
+            bounds of the window and data is the result of getData on it (None if the
+            window could not be recovered).
+        """
+        now = pd.Timestamp.now(tz="UTC")
+        first = parseDate(start, now)
+        last = parseDate(stop if stop is not None else "now", now)
+        step = parseDuration(window)
+        if first is None or last is None or step is None:
+            self.logger.warning("iterData -> Invalid start, stop or window parameter")
+            return
+        if first + step <= first:
+            self.logger.warning("iterData -> The window must be a positive duration")
+            return
+
+        ## Each edge is computed from the start, so that calendar windows do not drift
+        ## (e.g 31 January, 28 February, 31 March with a one month window)
+        windows = []
+        k = 0
+        begin = first
+        while begin < last:
+            end = first + step * (k + 1)
+            windows.append((formatDate(begin), formatDate(min(end, last))))
+            begin = end
+            k += 1
+
+        executor = ThreadPoolExecutor(max_workers=max(1, prefetch))
+        pending = deque()
+        try:
+            for begin, end in windows:
+                pending.append((begin, end, executor.submit(
+                    self.limiter.run, self.getData, sites=sites, sensor_types=sensor_types,
+                    sensors=sensors, start=begin, stop=end, aggrFn=aggrFn, aggrEvery=aggrEvery,
+                    useCoverage=useCoverage
+                )))
+                ## Keep at most `prefetch` windows ahead and stay within the memory budget
+                while len(pending) > prefetch or (
+                        maxBytes is not None and len(pending) > 1
+                        and self.__bufferedBytes(pending) > maxBytes):
+                    begin, end, future = pending.popleft()
+                    yield begin, end, future.result()
+            while pending:
+                begin, end, future = pending.popleft()
+                yield begin, end, future.result()
+        finally:
+            for _, _, future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def iterFlaggedData(
+            self,
+            sites: list = None,
+            sensor_types: list = None,
+            sensors: list = None,
+            start: str = None,
+            stop: str = None,
+            window: str = "1mo",
+            prefetch: int = 2,
+            valueRanges: dict = None,
+            **qcParameters
+    ):
+        """
+        Iterates over consecutive time windows like iterData and adds quality flags to the
+        values of each sensor (see qc.QualityControl). The flags are a bit mask combining
+        qc.OUT_OF_RANGE, qc.IMPLAUSIBLE, qc.STUCK, qc.SPIKE, qc.GAP and qc.OUT_OF_PERIOD.
+        The active period of each sensor comes from getCoverage and the site coordinates
+        used by the physical limits come from getSiteCoordinates.
+
+        Parameters
+        ----------
+        sites : list
+            This list is used to specify the sites for which we will search the data.
+        sensor_types : list
+            This list is used to specify sensor types used to recover the data.
+        sensors : list
+            This list is used to specify the sensors used to recover the data.
+        start : str
+            This string specifies the starting date of the first window (see getData).
+        stop : str (OPTIONAL)
+            This string specifies the ending date of the last window (set on now by default).
+        window : str (OPTIONAL)
+            This string is the length of each window (one month by default).
+        prefetch : int (OPTIONAL)
+            This integer is the number of windows downloaded ahead of the current one.
+        valueRanges : dict (OPTIONAL)
+            This dictionary gives the (min, max) valid range per sensor type, replacing the
+            defaults of qc.DEFAULT_RANGES.
+        qcParameters : (OPTIONAL)
+            The other parameters of qc.QualityControl (stuckLength, stepThreshold, interval,
+            gapFactor).
+
+        Returns
+        -------
+            A generator of (start, stop, data) tuples, where data is structured as the
+            result of getData with an additional 'flags' numpy array per sensor.
+        """
+        types = {}
+        for sensor_type in sensor_types if sensor_types is not None else (self.getAllTypes() or []):
+            for sensor in self.getSensors(sites=sites, sensor_types=[sensor_type]) or []:
+                types[sensor] = sensor_type
+        coverage = self.getCoverage(sites=sites, sensor_types=sensor_types, sensors=sensors) or {}
+        valueRanges = valueRanges if valueRanges is not None else {}
+
+        controls = {}
+        coordinates = {}
+        for begin, end, data in self.iterData(sites=sites, sensor_types=sensor_types, sensors=sensors,
+                                              start=start, stop=stop, window=window, prefetch=prefetch):
+            for site in data or {}:
+                if site not in coordinates:
+                    coordinates[site] = self.getSiteCoordinates(site)
+                for sensor, values in data[site].items():
+                    if (site, sensor) not in controls:
+                        bounds = coverage.get(site, {}).get(sensor)
+                        controls[(site, sensor)] = QualityControl(
+                            sensorType=types.get(sensor),
+                            valueRange=valueRanges.get(types.get(sensor)),
+                            coordinates=coordinates[site],
+                            period=(bounds["start"], None if bounds["live"] else bounds["stop"]) if bounds else None,
+                            **qcParameters
+                        )
+                    values["flags"] = controls[(site, sensor)].flag(values["dates"], values["values"])
+            yield begin, end, data
+
+    @staticmethod
+    def __bufferedBytes(pending):
+        ## Rough size of the downloaded windows: a date string and a float per value
+        size = 0
+        for _, _, future in pending:
+            if future.done() and not future.cancelled() and future.exception() is None:
+                data = future.result() or {}
+                for site in data:
+                    for sensor in data[site]:
+                        size += 80 * len(data[site][sensor].get("values", []))
+        return size
+
     def getBounds(
             self,
             sites: list = None,
@@ -465,7 +833,7 @@ class SolarDB():
             query += "?" + args
 
         try:
-            res = requests.get(query, cookies=self.__cookies, verify=self.__verify)
+            res = self.__get(query)
             res.raise_for_status()
             bounds = json.loads(res.content)["data"]
             if bounds:
@@ -482,6 +850,134 @@ class SolarDB():
         except requests.exceptions.RequestException as err:
             self.logger.warning("getBounds -> Request Error:\n%s\n", err)
 
+    def getCoverage(
+            self,
+            sites: list = None,
+            sensor_types: list = None,
+            sensors: list = None,
+            refresh: bool = False
+    ):
+        """
+        Returns the coverage index of the sensors associated to at least one site, sensor
+        and/or type. The index is built from getBounds and cached for coverageTTL seconds
+        (see the constructor), so that later calls for the same selection do not reach
+        SolarDB. Sensors whose last value is recent (see LIVE_MARGIN) are marked as live,
+        as they keep receiving data after the index is built.
+
+        Parameters
+        ----------
+        sites : list
+            This list is used to specify the sites for which we will search the coverage.
+        sensor_types : list
+            This list is used to specify sensor types used to recover in SolarDB.
+        sensors : list
+            This list is used to specify the sensors used to recover the coverage.
+        refresh : bool (OPTIONAL)
+            This boolean, which is false by default, forces the index to be rebuilt from
+            SolarDB.
+
+        Returns
+        -------
+            A dictionary containing the first and last timestamps (as UTC pandas Timestamps)
+            per site and sensor structured as follows:
+            {
+                site{
+                    sensor{
+                        start:  Timestamp
+                        stop:   Timestamp
+                        live:   bool
+                    }
+                }
+            }
+            or None if the bounds could not be recovered.
+        """
+        key = tuple(tuple(sorted(arg)) if arg is not None else None for arg in (sites, sensor_types, sensors))
+        if not refresh and key in self.__coverage:
+            built, coverage = self.__coverage[key]
+            if time.monotonic() - built < self.__coverageTTL:
+                return coverage
+        bounds = self.getBounds(sites=sites, sensor_types=sensor_types, sensors=sensors)
+        if bounds is None:
+            return None
+        now = pd.Timestamp.now(tz="UTC")
+        coverage = {}
+        for site in bounds:
+            coverage[site] = {}
+            for sensor in bounds[site]:
+                first = parseDate(bounds[site][sensor].get("start"))
+                last = parseDate(bounds[site][sensor].get("stop"))
+                if first is not None and last is not None:
+                    coverage[site][sensor] = {"start": first, "stop": last, "live": last >= now - LIVE_MARGIN}
+        self.__coverage[key] = (time.monotonic(), coverage)
+        return coverage
+
+    def clearCoverage(self):
+        """
+        Empties the coverage index cache.
+        """
+        self.__coverage = {}
+
+    def clipToCoverage(
+            self,
+            sites: list = None,
+            sensor_types: list = None,
+            sensors: list = None,
+            start: str = None,
+            stop: str = None
+    ):
+        """
+        Restricts a data request to the sensors and time period actually covered by SolarDB.
+        Live sensors (see getCoverage) are never dropped nor clipped on the ending date, as
+        the cached index does not know about their latest values.
+
+        Parameters
+        ----------
+        sites : list
+            This list is used to specify the sites of the request.
+        sensor_types : list
+            This list is used to specify sensor types of the request.
+        sensors : list
+            This list is used to specify the sensors of the request.
+        start : str (OPTIONAL)
+            This string specifies the starting date of the request (see getData).
+        stop : str (OPTIONAL)
+            This string specifies the ending date of the request (see getData).
+
+        Returns
+        -------
+            A (sensors, start, stop) tuple to use in place of the original parameters, or
+            None if no sensor has data in the requested time period. If the coverage cannot
+            be established, the parameters are returned unchanged.
+        """
+        coverage = self.getCoverage(sites=sites, sensor_types=sensor_types, sensors=sensors)
+        now = pd.Timestamp.now(tz="UTC")
+        first = parseDate(start if start is not None else "-1d", now)
+        last = parseDate(stop if stop is not None else "now", now)
+        if coverage is None or first is None or last is None:
+            return sensors, start, stop
+
+        kept = []
+        covered_first, covered_last = None, None
+        for site in coverage:
+            for sensor, bounds in coverage[site].items():
+                stop_bound = last if bounds["live"] else bounds["stop"]
+                if bounds["start"] > last or stop_bound < first:
+                    continue
+                kept.append(sensor)
+                covered_first = bounds["start"] if covered_first is None else min(covered_first, bounds["start"])
+                covered_last = stop_bound if covered_last is None else max(covered_last, stop_bound)
+        if not kept:
+            return None
+
+        total = sum(len(coverage[site]) for site in coverage)
+        if len(kept) < total:
+            sensors = kept
+        if covered_first > first:
+            start = formatDate(covered_first)
+        if covered_last < last:
+            stop = formatDate(covered_last + pd.Timedelta(seconds=1))
+        return sensors, start, stop
+
     ## Methods to recover the metadata ----------------------------------------------------
 
     def getCampaigns(
@@ -543,7 +1039,7 @@ class SolarDB():
             query += "?" + args
 
         try:
-            res = requests.get(query, cookies=self.__cookies, verify=self.__verify)
+            res = self.__get(query)
             res.raise_for_status()
             campaigns = json.loads(res.content)["data"]
             if campaigns:
@@ -618,7 +1114,7 @@ class SolarDB():
             query += "?" + args
 
         try:
-            res = requests.get(query, cookies=self.__cookies, verify=self.__verify)
+            res = self.__get(query)
             res.raise_for_status()
             instruments = json.loads(res.content)["data"]
             if instruments:
@@ -693,7 +1189,7 @@ class SolarDB():
             query += "?" + args
 
         try:
-            res = requests.get(query, cookies=self.__cookies, verify=self.__verify)
+            res = self.__get(query)
             res.raise_for_status()
             measures = json.loads(res.content)["data"]
             if measures:
@@ -762,7 +1258,7 @@ class SolarDB():
             query += "?" + args
 
         try:
-            res = requests.get(query, cookies=self.__cookies, verify=self.__verify)
+            res = self.__get(query)
             res.raise_for_status()
             models = json.loads(res.content)["data"]
             if models:
@@ -781,7 +1277,7 @@ class SolarDB():
 
     ## Utils
 
-    def getSiteDataframe(self, site: str, sensor_types: list = None, start: str = None, stop: str = None):
+    def getSiteDataframe(self, site: str, sensor_types: list = None, start: str = None, stop: str = None, asArrow: bool = False):
         """
         Extracts a CSV file containing the data associated to a site and converts it into
         a pandas dataframe object. The user can choose the time period on which the extraction
@@ -807,11 +1303,14 @@ class SolarDB():
             format as "start".
         sensor_types : list
             This list is used to specify sensor types to recover in SolarDB.
+        asArrow : bool (OPTIONAL)
+            This boolean, which is false by default, parses the CSV directly into a pyarrow
+            Table instead of a pandas dataframe. It requires pyarrow.
 
         Returns
         -------
-            A Pandas dataframe containing the data for each sensor of the site on the requested
-            time period.
+            A Pandas dataframe (or a pyarrow Table if asArrow is set) containing the data for
+            each sensor of the site on the requested time period.
 
         Raises
         ------
@@ -825,6 +1324,8 @@ class SolarDB():
         RequestException
             In case an error that is unaccounted for happens
         """
+        if asArrow:
+            arrow.requireArrow()
         query = self.__baseURL + "data/csv/" + site
         args = ""
         if start is not None:
@@ -836,8 +1337,15 @@ class SolarDB():
         if args != "":
             query += "?" + args
         try:
-            res = requests.get(query, cookies=self.__cookies, verify=self.__verify)
+            res = self.__get(query)
             res.raise_for_status()
+            if asArrow:
+                table = arrow.csvToArrow(res.content)
+                if table is None:
+                    self.logger.warning("There is no data for the given parameters. Please change your request.")
+                else:
+                    self.logger.debug("Arrow table succesfully extracted")
+                return table
             try:
                 df = pd.read_csv(StringIO(res.text))
                 self.logger.debug("pandas dataframe succesfully extracted")
@@ -854,6 +1362,123 @@ class SolarDB():
         except requests.exceptions.RequestException as err:
             self.logger.warning("getData -> Request Error:\n%s\n", err)
 
+    def getSiteCoordinates(self, site: str):
+        """
+        Recovers the coordinates of a site from the campaigns' metadata.
+
+        Parameters
+        ----------
+        site : str
+            This string is the alias of the site.
+
+        Returns
+        -------
+            A (latitude, longitude) tuple in degrees, or None if the metadata of the site
+            does not contain its coordinates.
+        """
+        campaigns = self.getCampaigns(alias=site)
+        if not campaigns:
+            return None
+        latitude = self.__findField(campaigns, ("latitude", "lat"))
+        longitude = self.__findField(campaigns, ("longitude", "lon", "lng"))
+        if latitude is None or longitude is None:
+            self.logger.info("The coordinates of %s are not available in its metadata", site)
+            return None
+        return float(latitude), float(longitude)
+
+    @classmethod
+    def __findField(cls, metadata, names: tuple):
+        ## Depth-first search of the first numeric field with one of the given names
+        if isinstance(metadata, dict):
+            for key, value in metadata.items():
+                if key.lower() in names and isinstance(value, (int, float, str)):
+                    try:
+                        return float(value)
+                    except ValueError:
+                        pass
+            metadata = list(metadata.values())
+        if isinstance(metadata, list):
+            for value in metadata:
+                found = cls.__findField(value, names)
+                if found is not None:
+                    return found
+        return None
+
+    def getSolarQuantities(
+            self,
+            sites: list,
+            start: str = None,
+            stop: str = None,
+            aggrFn: str = None,
+            aggrEvery: str = None
+    ):
+        """
+        Recovers the GHI, DNI and DHI of the sites and computes the solar derived quantities
+        on them (see solar.addSolarQuantities): solar zenith angle, extraterrestrial
+        irradiance, clear-sky GHI, clear-sky index and closure ratio. The computation is
+        vectorized over every timestamp of a site. When a site has several sensors of the
+        same type, their values are averaged. With an aggregation, the geometry is
+        averaged over each bin, which only matches mean irradiances: other aggregation
+        functions are refused.
+
+        Parameters
+        ----------
+        sites : list
+            This list is used to specify the sites for which we will compute the quantities.
+        start : str (OPTIONAL)
+            This string specifies the starting date for the data recovery (see getData).
+        stop : str (OPTIONAL)
+            This string specifies the ending date for the data recovery (see getData).
+        aggrFn : str (OPTIONAL)
+            This string represents the function to apply for the aggregation (see getData).
+        aggrEvery : str (OPTIONAL)
+            This string represents the period for the aggregation (see getData).
+
+        Returns
+        -------
+            A dictionary containing a pandas dataframe indexed by time per site. Sites
+            without data or coordinates are missing from it. None if the aggregation is
+            not supported.
+        """
+        period = None
+        if aggrEvery is not None:
+            if aggrFn not in (None, "mean"):
+                self.logger.warning("getSolarQuantities -> Only the 'mean' aggregation is supported")
+                return None
+            period = parseDuration(aggrEvery)
+            if period is None:
+                self.logger.warning("getSolarQuantities -> Invalid aggrEvery parameter")
+                return None
+        irradiance = ["GHI", "DNI", "DHI"]
+        data = self.getBulkData(sites=sites, sensor_types=irradiance, start=start, stop=stop, aggrFn=aggrFn, aggrEvery=aggrEvery)
+        sensor_types = {}
+        for sensor_type in irradiance:
+            for sensor in self.getSensors(sites=sites, sensor_types=[sensor_type]) or []:
+                sensor_types[sensor] = sensor_type
+
+        frames = {}
+        for site in data:
+            coordinates = self.getSiteCoordinates(site)
+            if coordinates is None:
+                self.logger.warning("getSolarQuantities -> No coordinates for %s", site)
+                continue
+            columns = {}
+            for sensor, values in data[site].items():
+                if sensor not in sensor_types:
+                    continue
+                series = pd.Series(
+                    pd.to_numeric(values["values"], errors="coerce"),
+                    index=pd.to_datetime(values["dates"], utc=True)
+                )
+                columns.setdefault(sensor_types[sensor], []).append(series)
+            if not columns:
+                continue
+            df = pd.DataFrame({
+                sensor_type: pd.concat(series, axis=1).mean(axis=1) for sensor_type, series in columns.items()
+            }).sort_index()
+            frames[site] = solar.addSolarQuantities(df, *coordinates, period=period)
+        return frames
+
     def setLoggerLevel(self, val: int):
         """
         Changes the logging level. It is used to enable and/or disable the messages.
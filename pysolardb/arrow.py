@@ -0,0 +1,93 @@
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pcsv
+except ImportError:
+    pa = None
+
+## Schema of the tables built from the getData results
+SCHEMA = None if pa is None else pa.schema([
+    ("site", pa.dictionary(pa.int32(), pa.string())),
+    ("sensor", pa.dictionary(pa.int32(), pa.string())),
+    ("time", pa.timestamp("ns", tz="UTC")),
+    ("value", pa.float64())
+])
+
+
+def requireArrow():
+    """
+    Raises an ImportError if the optional pyarrow dependency is not installed.
+    """
+    if pa is None:
+        raise ImportError("The Arrow output requires pyarrow: pip install pysolardb[arrow]")
+
+
+def dataToArrow(data: dict):
+    """
+    Converts the result of getData into an Arrow table in long format, with one row per
+    value and the columns 'site' and 'sensor' (dictionary encoded), 'time' (UTC timestamp)
+    and 'value' (float). The table can be handed over to pandas (to_pandas), Polars
+    (polars.from_arrow) or DuckDB without further conversion.
+
+    Parameters
+    ----------
+    data : dict
+        The dictionary returned by getData.
+
+    Returns
+    -------
+        A pyarrow Table.
+    """
+    requireArrow()
+    sites, sensors, site_codes, sensor_codes, lengths = [], [], [], [], []
+    dates, values = [], []
+    for site in data or {}:
+        sites.append(site)
+        for sensor, series in data[site].items():
+            sensors.append(sensor)
+            site_codes.append(len(sites) - 1)
+            sensor_codes.append(len(sensors) - 1)
+            lengths.append(len(series["values"]))
+            dates.extend(series["dates"])
+            values.extend(series["values"])
+
+    lengths = np.asarray(lengths, dtype=np.int64)
+    columns = [
+        pa.DictionaryArray.from_arrays(
+            pa.array(np.repeat(np.asarray(site_codes, dtype=np.int32), lengths), pa.int32()),
+            pa.array(sites, pa.string())
+        ),
+        pa.DictionaryArray.from_arrays(
+            pa.array(np.repeat(np.asarray(sensor_codes, dtype=np.int32), lengths), pa.int32()),
+            pa.array(sensors, pa.string())
+        ),
+        pc.cast(pa.array(dates, pa.string()), pa.timestamp("ns", tz="UTC")),
+        pa.array(values, pa.float64(), from_pandas=True)
+    ]
+    return pa.Table.from_arrays(columns, schema=SCHEMA)
+
+
+def csvToArrow(content: bytes):
+    """
+    Parses a CSV response of SolarDB directly into an Arrow table, the time column being
+    typed as a timestamp and the sensor columns as floats.
+
+    Parameters
+    ----------
+    content : bytes
+        The body of the CSV response.
+
+    Returns
+    -------
+        A pyarrow Table, or None if the response is empty.
+    """
+    requireArrow()
+    if not content.strip():
+        return None
+    table = pcsv.read_csv(pa.BufferReader(content))
+    for i, field in enumerate(table.schema):
+        if pa.types.is_integer(field.type):
+            table = table.set_column(i, field.name, pc.cast(table.column(i), pa.float64()))
+    return table
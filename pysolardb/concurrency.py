@@ -0,0 +1,157 @@
+import time
+import threading
+
+
+class TokenBucket():
+    """
+    Token bucket used to cap the number of requests sent to SolarDB per second.
+
+    Parameters
+    ----------
+    rate : float
+        This float is the number of tokens (i.e requests) added to the bucket per second.
+    capacity : int (OPTIONAL)
+        This integer is the maximum number of tokens stored in the bucket, which is the
+        largest burst of requests allowed (set on the rate by default).
+    """
+
+    def __init__(self, rate: float, capacity: int = None):
+        if rate <= 0:
+            raise ValueError("The rate of a token bucket must be positive")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1, int(rate))
+        self.__tokens = float(self.capacity)
+        self.__last = time.monotonic()
+        self.__lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Takes a token from the bucket, waiting for one to be available if needed.
+        """
+        while True:
+            with self.__lock:
+                now = time.monotonic()
+                self.__tokens = min(self.capacity, self.__tokens + (now - self.__last) * self.rate)
+                self.__last = now
+                if self.__tokens >= 1:
+                    self.__tokens -= 1
+                    return
+                wait = (1 - self.__tokens) / self.rate
+            time.sleep(wait)
+
+
+class AdaptiveLimiter():
+    """
+    Concurrency limiter following an AIMD (additive increase, multiplicative decrease)
+    policy. The number of requests allowed in flight grows by one for every window of
+    successful requests and is cut down when a request fails or when its latency exceeds
+    the observed baseline. The baseline is a slow moving average of the latency of every
+    successful request, slow ones included, so that it follows the cost of the requests
+    when it changes (e.g empty windows followed by full ones) instead of staying on the
+    first value seen. The limit is decreased at most once per congestion event: the
+    slow or failed requests sent before the last decrease are ignored, as they were in
+    flight under the previous limit.
+
+    Parameters
+    ----------
+    maxLimit : int (OPTIONAL)
+        This integer is the maximum number of concurrent requests (8 by default).
+    minLimit : int (OPTIONAL)
+        This integer is the minimum number of concurrent requests (1 by default).
+    initial : int (OPTIONAL)
+        This integer is the starting number of concurrent requests (2 by default).
+    backoff : float (OPTIONAL)
+        This float is the factor applied to the limit on congestion (0.5 by default).
+    tolerance : float (OPTIONAL)
+        This float is the ratio between the latency of a request and the baseline latency
+        above which the request is considered as a congestion signal (2 by default).
+    rateLimit : float (OPTIONAL)
+        This float, if given, caps the number of requests sent per second using a
+        TokenBucket.
+    smoothing : float (OPTIONAL)
+        This float is the weight of a new latency in the baseline (0.1 by default).
+    """
+
+    def __init__(
+            self,
+            maxLimit: int = 8,
+            minLimit: int = 1,
+            initial: int = 2,
+            backoff: float = 0.5,
+            tolerance: float = 2.0,
+            rateLimit: float = None,
+            smoothing: float = 0.1
+    ):
+        self.maxLimit = max(1, maxLimit)
+        self.minLimit = max(1, min(minLimit, self.maxLimit))
+        self.limit = float(min(max(initial, self.minLimit), self.maxLimit))
+        self.backoff = backoff
+        self.tolerance = tolerance
+        self.bucket = TokenBucket(rateLimit) if rateLimit is not None else None
+        self.smoothing = smoothing
+        self.baseline = None
+        self.__lastDecrease = None
+        self.__inflight = 0
+        self.__cond = threading.Condition()
+
+    def acquire(self):
+        """
+        Waits until a request can be sent without exceeding the current limit.
+        """
+        with self.__cond:
+            while self.__inflight >= int(self.limit):
+                self.__cond.wait()
+            self.__inflight += 1
+        if self.bucket is not None:
+            self.bucket.acquire()
+
+    def release(self, latency: float, success: bool):
+        """
+        Frees a slot and updates the limit with the outcome of the request.
+
+        Parameters
+        ----------
+        latency : float
+            This float is the duration of the request in seconds, used to know whether
+            it was sent before the last decrease.
+        success : bool
+            This boolean indicates whether the request succeeded.
+        """
+        with self.__cond:
+            now = time.monotonic()
+            self.__inflight -= 1
+            congested = not success
+            if success:
+                if self.baseline is None:
+                    self.baseline = latency
+                else:
+                    congested = latency > self.tolerance * self.baseline
+                    ## Slowly track the latency in both directions, so that a change in the
+                    ## cost of the requests only counts as congestion for a few requests
+                    self.baseline += self.smoothing * (latency - self.baseline)
+            if congested:
+                ## Requests sent before the last decrease belong to the same congestion event
+                if self.__lastDecrease is None or now - latency >= self.__lastDecrease:
+                    self.limit = max(self.minLimit, self.limit * self.backoff)
+                    self.__lastDecrease = now
+            else:
+                self.limit = min(self.maxLimit, self.limit + 1 / self.limit)
+            self.__cond.notify_all()
+
+    def run(self, fn, *args, **kwargs):
+        """
+        Calls fn under the limiter. As the SolarDB methods log their errors and return
+        None, a None result is accounted as a failed request.
+
+        Returns
+        -------
+            The result of fn.
+        """
+        self.acquire()
+        begin = time.monotonic()
+        result = None
+        try:
+            result = fn(*args, **kwargs)
+            return result
+        finally:
+            self.release(time.monotonic() - begin, result is not None)
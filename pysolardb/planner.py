@@ -0,0 +1,263 @@
+import numpy as np
+import pandas as pd
+from .utils import parseDate, parseDuration, formatDate, durationToTimedelta
+
+## SolarDB objects created by the worker processes, per set of constructor arguments
+_clients = {}
+
+
+class ReadTask():
+    """
+    Independent piece of a read plan: the data of some sensors of one site over a time
+    window. A task only holds plain values, so it can be pickled or converted to a
+    dictionary (toDict) and sent to any executor.
+
+    Parameters
+    ----------
+    index : int
+        The position of the task in the plan, used to reassemble the results in order.
+    site : str
+        The alias of the site.
+    sensors : list
+        The sensor IDs to recover.
+    start : str
+        The RFC3339 starting date of the window.
+    stop : str
+        The RFC3339 ending date of the window.
+    rows : int
+        The estimated number of values of the task.
+    aggrFn : str (OPTIONAL)
+        The aggregation function (see getData).
+    aggrEvery : str (OPTIONAL)
+        The aggregation period (see getData).
+    """
+
+    def __init__(
+            self,
+            index: int,
+            site: str,
+            sensors: list,
+            start: str,
+            stop: str,
+            rows: int,
+            aggrFn: str = None,
+            aggrEvery: str = None
+    ):
+        self.index = index
+        self.site = site
+        self.sensors = sensors
+        self.start = start
+        self.stop = stop
+        self.rows = rows
+        self.aggrFn = aggrFn
+        self.aggrEvery = aggrEvery
+
+    def __repr__(self):
+        return "ReadTask(%d, %s, %d sensors, %s -> %s, ~%d rows)" % (
+            self.index, self.site, len(self.sensors), self.start, self.stop, self.rows
+        )
+
+    def toDict(self):
+        """
+        Returns the task as a JSON serializable dictionary.
+        """
+        return dict(self.__dict__)
+
+    @classmethod
+    def fromDict(cls, task: dict):
+        """
+        Builds a task from the result of toDict.
+        """
+        return cls(**task)
+
+    def run(self, client=None, **clientArgs):
+        """
+        Recovers the data of the task.
+
+        Parameters
+        ----------
+        client : SolarDB (OPTIONAL)
+            The client used to reach SolarDB. When it is not given (e.g in a worker
+            process), a SolarDB object is created with clientArgs once per process and
+            reused by the next tasks. Giving it a sessionStore avoids logging in from
+            every process. The request goes through the adaptive limiter of the client,
+            so tasks run by threads sharing a client respect its concurrency and rate
+            limits.
+        clientArgs : (OPTIONAL)
+            The arguments of the SolarDB constructor.
+
+        Returns
+        -------
+            The (index, data) tuple, where data is the result of getData.
+        """
+        if client is None:
+            key = tuple(sorted(clientArgs.items()))
+            if key not in _clients:
+                from .SolarDB import SolarDB
+                _clients[key] = SolarDB(**clientArgs)
+            client = _clients[key]
+        ## Sent under the limiter of the client, like the other parallel data paths
+        data = client.limiter.run(
+            client.getData, sites=[self.site], sensors=self.sensors, start=self.start, stop=self.stop,
+            aggrFn=self.aggrFn, aggrEvery=self.aggrEvery
+        )
+        return self.index, data
+
+
+def _calendarEdges(first: pd.Timestamp, last: pd.Timestamp, aggrEvery: str):
+    ## Starts (in seconds) of the calendar aggregation windows ('mo' or 'y' durations)
+    ## covering [first, last], aligned on multiples of the duration since 1970
+    kwds = parseDuration(aggrEvery).kwds
+    months = kwds.get("months", 0) + 12 * kwds.get("years", 0)
+    if months <= 0:
+        return None
+    index = (first.year - 1970) * 12 + first.month - 1
+    index -= index % months
+    begin = pd.Timestamp(year=1970 + index // 12, month=index % 12 + 1, day=1, tz="UTC")
+    edges = pd.date_range(begin, last + pd.DateOffset(months=months), freq=pd.DateOffset(months=months))
+    return np.asarray([edge.value / 1e9 for edge in edges])
+
+
+def planReads(
+        client,
+        sites: list = None,
+        sensor_types: list = None,
+        sensors: list = None,
+        start: str = None,
+        stop: str = None,
+        aggrFn: str = None,
+        aggrEvery: str = None,
+        interval=None,
+        targetRows: int = 500000
+):
+    """
+    Splits a data request into read tasks of about the same number of values. The active
+    period of every sensor comes from getCoverage and its number of values is estimated
+    from its sampling interval, so that sites and periods with many sensors are cut into
+    shorter windows than sparse ones.
+
+    Parameters
+    ----------
+    client : SolarDB
+        The client used to recover the coverage and sensor types.
+    sites, sensor_types, sensors, start, stop, aggrFn, aggrEvery :
+        The parameters of the request (see getData).
+    interval : str or dict (OPTIONAL)
+        The expected sampling interval ('1m' by default), either for every sensor or as a
+        dictionary per sensor ID or sensor type (the 'default' key being used for the
+        others). When aggrEvery is given, it caps the number of values and the windows
+        are cut on the boundaries of the aggregation windows, calendar ones included
+        ('mo' and 'y' durations), so that no aggregate is split between two tasks.
+    targetRows : int (OPTIONAL)
+        The number of values aimed for each task (500000 by default).
+
+    Returns
+    -------
+        A list of ReadTask ordered by site and time.
+    """
+    now = pd.Timestamp.now(tz="UTC")
+    first = parseDate(start if start is not None else "-1d", now)
+    last = parseDate(stop if stop is not None else "now", now)
+    coverage = client.getCoverage(sites=sites, sensor_types=sensor_types, sensors=sensors) or {}
+
+    intervals = interval if isinstance(interval, dict) else {"default": interval or "1m"}
+    types = {}
+    if any(key != "default" for key in intervals):
+        for sensor_type in sensor_types if sensor_types is not None else (client.getAllTypes() or []):
+            if sensor_type in intervals:
+                for sensor in client.getSensors(sites=sites, sensor_types=[sensor_type]) or []:
+                    types[sensor] = sensor_type
+    ## Boundaries of the aggregation windows: a fixed step, or calendar edges for months
+    ## and years. Without known boundaries, an aggregated request is not split
+    step = durationToTimedelta(aggrEvery) if aggrEvery is not None else None
+    edges = None
+    if aggrEvery is not None and step is None:
+        edges = _calendarEdges(first, last, aggrEvery) if parseDuration(aggrEvery) is not None else None
+        if edges is None:
+            targetRows = np.inf
+    period = step.total_seconds() if step is not None else None
+    if edges is not None:
+        period = float(np.mean(np.diff(edges)))
+
+    def rate(sensor):
+        ## Expected number of values per second
+        duration = intervals.get(sensor, intervals.get(types.get(sensor), intervals.get("default", "1m")))
+        seconds = durationToTimedelta(duration).total_seconds()
+        if period is not None:
+            seconds = max(seconds, period)
+        return 1 / seconds
+
+    def count(sensor_begin, sensor_end, r, begin, end):
+        ## Expected number of values of a sensor active over [sensor_begin, sensor_end)
+        ## within the window [begin, end)
+        lower, upper = max(begin, sensor_begin), min(end, sensor_end)
+        if edges is None:
+            return r * (upper - lower)
+        ## Number of calendar aggregation windows overlapped
+        return np.searchsorted(edges, upper, "left") - np.searchsorted(edges, lower, "right") + 1
+
+    tasks = []
+    for site in sorted(coverage):
+        periods = {}
+        for sensor, bounds in coverage[site].items():
+            begin = max(first, bounds["start"])
+            end = last if bounds["live"] else min(last, bounds["stop"] + pd.Timedelta(seconds=1))
+            if begin < end:
+                periods[sensor] = (begin.value / 1e9, end.value / 1e9, rate(sensor))
+        if not periods:
+            continue
+
+        ## The total rate is constant between two coverage bounds, so the cumulative number
+        ## of values is piecewise linear and can be inverted to find the cuts
+        events = np.unique([edge for begin, end, _ in periods.values() for edge in (begin, end)])
+        rates = np.array([
+            sum(r for begin, end, r in periods.values() if begin <= t0 < end) for t0 in events[:-1]
+        ])
+        cumulated = np.concatenate(([0.0], np.cumsum(rates * np.diff(events))))
+        parts = max(1, int(np.ceil(cumulated[-1] / targetRows)))
+        cuts = np.interp(np.arange(1, parts) * cumulated[-1] / parts, cumulated, events)
+        if step is not None:
+            cuts = np.round(cuts / step.total_seconds()) * step.total_seconds()
+        elif edges is not None and len(cuts):
+            ## Snap the cuts on the nearest calendar boundary
+            upper = np.clip(np.searchsorted(edges, cuts), 1, len(edges) - 1)
+            cuts = np.where(edges[upper] - cuts < cuts - edges[upper - 1], edges[upper], edges[upper - 1])
+        cuts = cuts[(cuts > events[0]) & (cuts < events[-1])]
+        cuts = np.unique(np.concatenate(([events[0]], np.floor(cuts), [np.ceil(events[-1])])))
+
+        for begin, end in zip(cuts[:-1], cuts[1:]):
+            active = [sensor for sensor, (b, e, _) in periods.items() if b < end and e > begin]
+            if not active:
+                continue
+            rows = sum(count(b, e, r, begin, end) for b, e, r in (periods[sensor] for sensor in active))
+            tasks.append(ReadTask(
+                len(tasks), site, sorted(active),
+                formatDate(pd.Timestamp(begin, unit="s", tz="UTC")), formatDate(pd.Timestamp(end, unit="s", tz="UTC")),
+                int(round(rows)), aggrFn, aggrEvery
+            ))
+    return tasks
+
+
+def assembleReads(results):
+    """
+    Reassembles the results of the tasks of a plan, in any order, into the structure
+    returned by getData.
+
+    Parameters
+    ----------
+    results : iterable
+        The (index, data) tuples returned by ReadTask.run.
+
+    Returns
+    -------
+        A dictionary containing the data per site and sensor, structured as the result
+        of getData.
+    """
+    data = {}
+    for _, part in sorted(results, key=lambda result: result[0]):
+        for site in part or {}:
+            for sensor, series in part[site].items():
+                merged = data.setdefault(site, {}).setdefault(sensor, {"dates": [], "values": []})
+                merged["dates"].extend(series["dates"])
+                merged["values"].extend(series["values"])
+    return data
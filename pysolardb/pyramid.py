@@ -0,0 +1,233 @@
+import os
+import logging
+import numpy as np
+import pandas as pd
+from .utils import parseDate, durationToTimedelta, unionIntervals
+
+## Default levels of the pyramid, from the finest to the coarsest
+DEFAULT_LEVELS = ["1m", "10m", "1h", "1d", "1w"]
+
+logger = logging.getLogger(__name__)
+
+
+def _rollup(dates: pd.DatetimeIndex, values: np.ndarray, step: pd.Timedelta):
+    ## Aggregates raw values into bins of `step` starting at the epoch
+    valid = ~np.isnan(values)
+    bins = dates[valid].floor(step)
+    frame = pd.DataFrame({"value": values[valid]}, index=bins)
+    grouped = frame.groupby(level=0)["value"]
+    return pd.DataFrame({
+        "sum": grouped.sum(),
+        "count": grouped.count(),
+        "min": grouped.min(),
+        "max": grouped.max()
+    })
+
+
+def _merge(stored: pd.DataFrame, update: pd.DataFrame):
+    ## Combines two sorted sets of bins, summing the sums and counts and keeping the
+    ## extrema. Only the bins found in both are combined (usually the last stored one
+    ## when the data is ingested in order), the others are appended
+    if stored is None or stored.empty:
+        return update
+    if update.empty:
+        return stored
+    positions = np.minimum(stored.index.searchsorted(update.index), len(stored) - 1)
+    overlap = np.asarray(stored.index[positions] == update.index)
+    if overlap.any():
+        rows = positions[overlap]
+        for j, (column, combine) in enumerate((("sum", np.add), ("count", np.add), ("min", np.fmin), ("max", np.fmax))):
+            stored.iloc[rows, j] = combine(stored[column].to_numpy()[rows], update[column].to_numpy()[overlap])
+    added = update[~overlap]
+    if added.empty:
+        return stored
+    both = pd.concat([stored, added])
+    return both if added.index[0] > stored.index[-1] else both.sort_index()
+
+
+class Pyramid():
+    """
+    Multi-resolution pyramid of aggregates (mean, min, max and count) per site and sensor.
+    It is built incrementally from downloaded raw data and answers range queries at any
+    resolution from the most suitable level, without requesting SolarDB.
+
+    Parameters
+    ----------
+    path : str (OPTIONAL)
+        The directory in which the pyramid is persisted. The pyramid only lives in memory
+        when it is not given.
+    levels : list (OPTIONAL)
+        The durations of the levels, following the SolarDB duration format with fixed
+        units ('m', 'h', 'd' or 'w'). See DEFAULT_LEVELS.
+    """
+
+    def __init__(self, path: str = None, levels: list = None):
+        self.path = os.path.expanduser(path) if path is not None else None
+        self.levels = levels if levels is not None else list(DEFAULT_LEVELS)
+        self.steps = [durationToTimedelta(level) for level in self.levels]
+        if any(step is None for step in self.steps):
+            raise ValueError("The levels of a pyramid must be fixed durations ('m', 'h', 'd' or 'w')")
+        order = np.argsort(self.steps)
+        self.levels = [self.levels[i] for i in order]
+        self.steps = [self.steps[i] for i in order]
+        self.__series = {}
+        self.__dirty = set()
+
+    def __file(self, site: str, sensor: str, level: str):
+        return os.path.join(self.path, site, sensor, level + ".pkl")
+
+    def __load(self, site: str, sensor: str):
+        key = (site, sensor)
+        if key not in self.__series:
+            tables = {}
+            if self.path is not None:
+                for level in self.levels + ["covered"]:
+                    if os.path.exists(self.__file(site, sensor, level)):
+                        tables[level] = pd.read_pickle(self.__file(site, sensor, level))
+            self.__series[key] = tables
+        return self.__series[key]
+
+    def covered(self, site: str, sensor: str):
+        """
+        Returns the periods already ingested for a sensor.
+
+        Returns
+        -------
+            A sorted list of (first, last) UTC Timestamp tuples, both included.
+        """
+        return list(self.__load(site, sensor).get("covered", []))
+
+    def update(self, site: str, sensor: str, dates, values):
+        """
+        Adds raw values of a sensor to every level of the pyramid. The periods already
+        ingested are recorded per sensor and the values falling in them are ignored (with
+        a warning), so that overlapping downloads are not counted twice. Older periods
+        can be ingested after newer ones.
+
+        Parameters
+        ----------
+        site : str
+            The alias of the site.
+        sensor : str
+            The sensor ID.
+        dates : array-like
+            The timestamps of the values.
+        values : array-like
+            The values, missing values being None or NaN.
+        """
+        tables = self.__load(site, sensor)
+        dates = pd.DatetimeIndex(pd.to_datetime(dates, utc=True))
+        values = pd.to_numeric(pd.Series(values, dtype=object), errors="coerce").to_numpy(dtype=float)
+        covered = tables.get("covered", [])
+        if covered and len(dates):
+            known = np.zeros(len(dates), dtype=bool)
+            for begin, end in covered:
+                known |= (dates >= begin) & (dates <= end)
+            if known.any():
+                logger.warning(
+                    "Pyramid -> %d values of %s/%s already ingested are ignored", int(known.sum()), site, sensor
+                )
+                dates, values = dates[~known], values[~known]
+        if len(dates) == 0:
+            return
+        for level, step in zip(self.levels, self.steps):
+            tables[level] = _merge(tables.get(level), _rollup(dates, values, step))
+        ## Consecutive windows leave a gap of about one sampling interval between the
+        ## last value of one and the first of the next, so such periods are merged
+        tolerance = self.steps[0]
+        if len(dates) > 1:
+            tolerance = max(tolerance, pd.Timedelta(np.median(np.diff(dates.sort_values().asi8)), unit=dates.unit))
+        tables["covered"] = unionIntervals(covered + [(dates.min(), dates.max())], tolerance=tolerance)
+        self.__dirty.add((site, sensor))
+
+    def ingest(self, data: dict):
+        """
+        Adds the result of getData (or of a window of iterData) to the pyramid.
+
+        Parameters
+        ----------
+        data : dict
+            The dictionary returned by getData. The data must not be aggregated.
+        """
+        for site in data or {}:
+            for sensor, series in data[site].items():
+                self.update(site, sensor, series["dates"], series["values"])
+
+    def save(self):
+        """
+        Writes the levels modified since the last save to the pyramid directory.
+        """
+        if self.path is None:
+            return
+        for site, sensor in self.__dirty:
+            tables = self.__series[(site, sensor)]
+            os.makedirs(os.path.dirname(self.__file(site, sensor, "covered")), exist_ok=True)
+            for level in self.levels + ["covered"]:
+                if level in tables:
+                    pd.to_pickle(tables[level], self.__file(site, sensor, level))
+        self.__dirty = set()
+
+    def query(
+            self,
+            site: str,
+            sensor: str,
+            start: str = None,
+            stop: str = None,
+            resolution: str = None,
+            maxPoints: int = None
+    ):
+        """
+        Returns the aggregates of a sensor over a time period.
+
+        Parameters
+        ----------
+        site : str
+            The alias of the site.
+        sensor : str
+            The sensor ID.
+        start : str (OPTIONAL)
+            The starting date of the period (see getData). The whole history by default.
+        stop : str (OPTIONAL)
+            The ending date of the period (see getData). The whole history by default.
+        resolution : str (OPTIONAL)
+            The requested duration of the bins. The coarsest level finer than this duration
+            is aggregated further to the exact resolution.
+        maxPoints : int (OPTIONAL)
+            The maximum number of bins wanted (e.g the width of a plot), used when no
+            resolution is given to pick the finest level that fits.
+
+        Returns
+        -------
+            A pandas dataframe indexed by the start of the bins with the columns mean, min,
+            max and count, or None if the pyramid contains no data for the sensor.
+        """
+        tables = self.__load(site, sensor)
+        if self.levels[0] not in tables:
+            return None
+        now = pd.Timestamp.now(tz="UTC")
+        first = parseDate(start, now) if start is not None else tables[self.levels[0]].index[0]
+        last = parseDate(stop, now) if stop is not None else tables[self.levels[0]].index[-1]
+
+        step = durationToTimedelta(resolution) if resolution is not None else None
+        index = 0
+        for i, level_step in enumerate(self.steps):
+            if step is not None:
+                if level_step <= step:
+                    index = i
+            elif maxPoints is not None:
+                index = i
+                if (last - first) / level_step <= maxPoints:
+                    break
+        table = tables[self.levels[index]]
+        table = table.loc[(table.index >= first.floor(self.steps[index])) & (table.index <= last)]
+        if step is not None and step != self.steps[index]:
+            table = table.groupby(table.index.floor(step)).agg(
+                {"sum": "sum", "count": "sum", "min": "min", "max": "max"}
+            )
+
+        return pd.DataFrame({
+            "mean": table["sum"] / table["count"],
+            "min": table["min"],
+            "max": table["max"],
+            "count": table["count"]
+        }, index=table.index)
@@ -0,0 +1,246 @@
+import numpy as np
+import pandas as pd
+from . import solar
+from .utils import toNanoseconds
+
+## Quality flags, combined as a bit mask per value
+OUT_OF_RANGE = 1
+IMPLAUSIBLE = 2
+STUCK = 4
+SPIKE = 8
+GAP = 16
+OUT_OF_PERIOD = 32
+
+## Default valid range per sensor type
+DEFAULT_RANGES = {
+    "GHI": (-4.0, 1500.0),
+    "DNI": (-4.0, 1400.0),
+    "DHI": (-4.0, 1000.0),
+    "TA": (-40.0, 60.0)
+}
+
+
+def physicalLimit(sensorType: str, dates, latitude: float, longitude: float):
+    """
+    Computes the BSRN physically possible upper limit of an irradiance component.
+
+    Parameters
+    ----------
+    sensorType : str
+        The sensor type ('GHI', 'DNI' or 'DHI').
+    dates : array-like
+        The timestamps of the values.
+    latitude : float
+        The latitude of the site in degrees.
+    longitude : float
+        The longitude of the site in degrees.
+
+    Returns
+    -------
+        A numpy array containing the upper limit in W/m², or None for other sensor types.
+    """
+    if sensorType not in ("GHI", "DNI", "DHI"):
+        return None
+    e0 = solar.extraterrestrialIrradiance(dates)
+    if sensorType == "DNI":
+        return e0
+    cos_zenith = np.maximum(np.cos(np.radians(solar.solarPosition(dates, latitude, longitude))), 0)
+    if sensorType == "GHI":
+        return 1.5 * e0 * cos_zenith ** 1.2 + 100
+    return 0.95 * e0 * cos_zenith ** 1.2 + 50
+
+
+class QualityControl():
+    """
+    Vectorized quality control of the values of one sensor. The values are given chunk by
+    chunk (in chronological order) and the state needed by the stuck, spike and gap tests
+    is carried from one chunk to the next, so that long periods can be checked without
+    loading them at once. As the flags of a chunk are returned before the next one is
+    seen, a stuck run crossing a chunk boundary is only flagged from the value at which
+    it reaches stuckLength: its first values, in the previous chunk, are not flagged
+    when that chunk held fewer than stuckLength of them.
+
+    Parameters
+    ----------
+    sensorType : str (OPTIONAL)
+        The sensor type, used to pick the default valid range and the physical limits.
+    valueRange : tuple (OPTIONAL)
+        The (min, max) valid range, which replaces the default one of the sensor type.
+    coordinates : tuple (OPTIONAL)
+        The (latitude, longitude) of the site, needed by the physical limits test.
+    period : tuple (OPTIONAL)
+        The (start, stop) active period of the sensor, as returned by getCoverage. The
+        stop is None for live sensors.
+    stuckLength : int (OPTIONAL)
+        The number of identical consecutive values flagged as stuck (10 by default). See
+        above for the runs crossing chunk boundaries. For irradiance sensors (GHI, DNI and
+        DHI), the values at night are left out of the runs, so that the zeros of every
+        night are not flagged: the night is given by the sun below the horizon when the
+        coordinates are known, and by the values at or below nightThreshold otherwise.
+    stepThreshold : float (OPTIONAL)
+        The absolute difference between consecutive values flagged as a spike (disabled
+        by default).
+    interval : str (OPTIONAL)
+        The expected sampling interval (e.g '1m'). When not given, it is estimated as the
+        median interval of the first chunk.
+    gapFactor : float (OPTIONAL)
+        The ratio to the expected interval above which a value is flagged as following a
+        gap (2 by default).
+    nightThreshold : float (OPTIONAL)
+        The irradiance (W/m²) at or below which a value is considered as a night value
+        when the coordinates are not known (5 by default).
+    """
+
+    def __init__(
+            self,
+            sensorType: str = None,
+            valueRange: tuple = None,
+            coordinates: tuple = None,
+            period: tuple = None,
+            stuckLength: int = 10,
+            stepThreshold: float = None,
+            interval: str = None,
+            gapFactor: float = 2.0,
+            nightThreshold: float = 5.0
+    ):
+        self.sensorType = sensorType
+        self.valueRange = valueRange if valueRange is not None else DEFAULT_RANGES.get(sensorType)
+        self.coordinates = coordinates
+        self.period = period
+        self.stuckLength = stuckLength
+        self.stepThreshold = stepThreshold
+        self.interval = pd.Timedelta(interval).value if interval is not None else None
+        self.gapFactor = gapFactor
+        self.nightThreshold = nightThreshold
+        ## State carried between chunks
+        self.__lastDate = None
+        self.__lastValue = np.nan
+        self.__lastStuckValue = np.nan
+        self.__run = 0
+
+    def flag(self, dates, values):
+        """
+        Checks a chunk of values.
+
+        Parameters
+        ----------
+        dates : array-like
+            The timestamps of the values.
+        values : array-like
+            The values, missing values being None or NaN.
+
+        Returns
+        -------
+            A numpy uint8 array containing the flags of each value (0 for valid values).
+        """
+        dates = pd.DatetimeIndex(pd.to_datetime(dates, utc=True))
+        values = pd.to_numeric(pd.Series(values, dtype=object), errors="coerce").to_numpy(dtype=float)
+        flags = np.zeros(len(values), dtype=np.uint8)
+        if len(values) == 0:
+            return flags
+
+        if self.valueRange is not None:
+            flags[(values < self.valueRange[0]) | (values > self.valueRange[1])] |= OUT_OF_RANGE
+
+        if self.coordinates is not None:
+            limit = physicalLimit(self.sensorType, dates, *self.coordinates)
+            if limit is not None:
+                flags[values > limit] |= IMPLAUSIBLE
+
+        if self.period is not None:
+            outside = dates < self.period[0]
+            if self.period[1] is not None:
+                outside |= dates > self.period[1]
+            flags[outside] |= OUT_OF_PERIOD
+
+        ## Previous value and date, including the last ones of the previous chunk
+        previous = np.concatenate(([self.__lastValue], values[:-1]))
+        nanoseconds = toNanoseconds(dates)
+        previous_dates = np.concatenate(([self.__lastDate if self.__lastDate is not None else nanoseconds[0]], nanoseconds[:-1]))
+
+        if self.stepThreshold is not None:
+            flags[np.abs(values - previous) > self.stepThreshold] |= SPIKE
+
+        if self.stuckLength is not None:
+            ## Night values are replaced by NaN, which never equals the previous value and
+            ## so breaks the runs
+            night = self.__night(dates, values)
+            candidates = np.where(night, np.nan, values)
+            previous_candidates = np.concatenate(([self.__lastStuckValue], candidates[:-1]))
+            flags[self.__stuck(candidates, previous_candidates) & ~night] |= STUCK
+            self.__lastStuckValue = candidates[-1]
+
+        deltas = nanoseconds - previous_dates
+        if self.interval is None and len(values) > 1:
+            self.interval = int(np.median(np.diff(nanoseconds)))
+        if self.interval:
+            flags[deltas > self.gapFactor * self.interval] |= GAP
+
+        self.__lastDate = nanoseconds[-1]
+        self.__lastValue = values[-1]
+        return flags
+
+    def __night(self, dates, values):
+        ## Values left out of the stuck test: irradiance when the sun is below the horizon
+        if self.sensorType not in ("GHI", "DNI", "DHI"):
+            return np.zeros(len(values), dtype=bool)
+        if self.coordinates is not None:
+            return solar.solarPosition(dates, *self.coordinates) >= 90
+        return values <= self.nightThreshold
+
+    def __stuck(self, values, previous):
+        ## Length of the run of identical values each value belongs to
+        same = values == previous
+        starts = np.flatnonzero(~same)
+        run_ids = np.cumsum(~same)
+        if not same[0]:
+            carried = 0
+        else:
+            carried = self.__run
+        bounds = np.append(starts, len(values))
+        if len(starts) == 0 or starts[0] != 0:
+            bounds = np.insert(bounds, 0, 0)
+            run_ids = run_ids + 1
+        lengths = np.diff(bounds)
+        lengths[0] += carried
+        run_lengths = lengths[run_ids - 1]
+        self.__run = lengths[-1]
+        return run_lengths >= self.stuckLength
+
+
+def checkStuckAtNight(latitude: float = -20.9, longitude: float = 55.5):
+    """
+    Checks on one day of 1-minute clear-sky GHI that the zeros of the night are not
+    flagged as stuck while a daytime plateau is, whether the coordinates are known or
+    not and whether the day is checked at once or hour by hour.
+
+    Returns
+    -------
+        A dictionary containing the number of night values flagged as stuck and the
+        number of plateau values not flagged, per case (all of them should be 0).
+    """
+    dates = pd.date_range("2023-01-15", periods=1440, freq="1min", tz="UTC")
+    values = np.round(solar.clearSkyGhi(solar.solarPosition(dates, latitude, longitude)), 1)
+    plateau = slice(420, 480)
+    values[plateau] = 500.0
+    night = values == 0
+
+    result = {}
+    for name, coordinates in (("coordinates", (latitude, longitude)), ("threshold", None)):
+        for chunk in (1440, 60):
+            control = QualityControl(sensorType="GHI", coordinates=coordinates)
+            flags = np.concatenate([
+                control.flag(dates[i:i + chunk], values[i:i + chunk]) for i in range(0, len(values), chunk)
+            ])
+            stuck = (flags & STUCK) != 0
+            result[(name, chunk)] = {
+                "nightStuck": int(stuck[night].sum()),
+                "plateauMissed": int((~stuck[plateau]).sum())
+            }
+    return result
+
+
+if __name__ == "__main__":
+    result = checkStuckAtNight()
+    print(result)
+    assert all(case["nightStuck"] == 0 and case["plateauMissed"] == 0 for case in result.values())
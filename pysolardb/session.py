@@ -0,0 +1,73 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+from contextlib import closing
+
+
+class SessionStore():
+    """
+    Session cookies shared between processes and SolarDB objects through a local SQLite
+    database, so that a pool of workers logs in once instead of once per process. The
+    sessions are indexed by a hash of the API URL and token, the token itself is not
+    stored. As the cookies give access to the session, the database file is only
+    readable by its owner (0600) and a directory created for it is private (0700).
+
+    Parameters
+    ----------
+    path : str
+        The path of the SQLite database file (created if needed).
+    timeout : float (OPTIONAL)
+        The number of seconds to wait for a lock held by another process (30 by default).
+    """
+
+    def __init__(self, path: str, timeout: float = 30.0):
+        self.path = os.path.expanduser(path)
+        self.timeout = timeout
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+        ## Create the file with restricted permissions before SQLite opens it, and restrict
+        ## an existing one
+        os.close(os.open(self.path, os.O_CREAT | os.O_RDWR, 0o600))
+        os.chmod(self.path, 0o600)
+        with closing(self.__connect()) as connection, connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS sessions (key TEXT PRIMARY KEY, cookies TEXT NOT NULL, updated REAL NOT NULL)"
+            )
+
+    def __connect(self):
+        return sqlite3.connect(self.path, timeout=self.timeout)
+
+    @staticmethod
+    def key(apiURL: str, token: str):
+        """
+        Returns the key of the session associated to an API URL and a token.
+        """
+        return hashlib.sha256((apiURL + "\n" + token).encode()).hexdigest()
+
+    def load(self, key: str):
+        """
+        Returns the cookies of a session as a dictionary, or None if there is no session.
+        """
+        with closing(self.__connect()) as connection, connection:
+            row = connection.execute("SELECT cookies FROM sessions WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def save(self, key: str, cookies: dict):
+        """
+        Stores the cookies of a session, replacing the previous ones.
+        """
+        with closing(self.__connect()) as connection, connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO sessions (key, cookies, updated) VALUES (?, ?, ?)",
+                (key, json.dumps(cookies), time.time())
+            )
+
+    def clear(self, key: str):
+        """
+        Removes a session.
+        """
+        with closing(self.__connect()) as connection, connection:
+            connection.execute("DELETE FROM sessions WHERE key = ?", (key,))
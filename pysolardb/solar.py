@@ -0,0 +1,213 @@
+import numpy as np
+import pandas as pd
+
+## Solar constant (W/m²)
+SOLAR_CONSTANT = 1361.0
+
+
+def _asTimes(times):
+    times = pd.DatetimeIndex(times)
+    if times.tz is None:
+        return times.tz_localize("UTC")
+    return times.tz_convert("UTC")
+
+
+def _dayAngle(times):
+    ## Fractional year (rad) used by the Spencer/NOAA approximations
+    hours = times.hour + times.minute / 60 + times.second / 3600
+    return 2 * np.pi / 365 * (np.asarray(times.dayofyear) - 1 + (np.asarray(hours) - 12) / 24), np.asarray(hours)
+
+
+def solarPosition(times, latitude: float, longitude: float):
+    """
+    Computes the solar zenith angle using the NOAA approximations of the declination and
+    equation of time.
+
+    Parameters
+    ----------
+    times : array-like
+        The timestamps (considered as UTC when they are naive).
+    latitude : float
+        The latitude of the site in degrees.
+    longitude : float
+        The longitude of the site in degrees (positive to the east).
+
+    Returns
+    -------
+        A numpy array containing the solar zenith angle in degrees.
+    """
+    gamma, hours = _dayAngle(_asTimes(times))
+    eqtime = 229.18 * (0.000075 + 0.001868 * np.cos(gamma) - 0.032077 * np.sin(gamma)
+                       - 0.014615 * np.cos(2 * gamma) - 0.040849 * np.sin(2 * gamma))
+    declination = (0.006918 - 0.399912 * np.cos(gamma) + 0.070257 * np.sin(gamma)
+                   - 0.006758 * np.cos(2 * gamma) + 0.000907 * np.sin(2 * gamma)
+                   - 0.002697 * np.cos(3 * gamma) + 0.00148 * np.sin(3 * gamma))
+    solar_time = hours * 60 + eqtime + 4 * longitude
+    hour_angle = np.radians(solar_time / 4 - 180)
+    lat = np.radians(latitude)
+    cos_zenith = np.sin(lat) * np.sin(declination) + np.cos(lat) * np.cos(declination) * np.cos(hour_angle)
+    return np.degrees(np.arccos(np.clip(cos_zenith, -1, 1)))
+
+
+def extraterrestrialIrradiance(times):
+    """
+    Computes the extraterrestrial normal irradiance corrected for the Earth-Sun distance
+    (Spencer, 1971).
+
+    Parameters
+    ----------
+    times : array-like
+        The timestamps (considered as UTC when they are naive).
+
+    Returns
+    -------
+        A numpy array containing the extraterrestrial irradiance in W/m².
+    """
+    gamma, _ = _dayAngle(_asTimes(times))
+    return SOLAR_CONSTANT * (1.000110 + 0.034221 * np.cos(gamma) + 0.001280 * np.sin(gamma)
+                             + 0.000719 * np.cos(2 * gamma) + 0.000077 * np.sin(2 * gamma))
+
+
+def clearSkyGhi(zenith):
+    """
+    Computes the clear-sky global horizontal irradiance with the Haurwitz model.
+
+    Parameters
+    ----------
+    zenith : array-like
+        The solar zenith angle in degrees.
+
+    Returns
+    -------
+        A numpy array containing the clear-sky GHI in W/m² (0 at night).
+    """
+    cos_zenith = np.cos(np.radians(np.asarray(zenith, dtype=float)))
+    ghi = np.zeros_like(cos_zenith)
+    day = cos_zenith > 0
+    ghi[day] = 1098 * cos_zenith[day] * np.exp(-0.057 / cos_zenith[day])
+    return ghi
+
+
+def clearSkyIndex(ghi, clearsky, minimum: float = 10.0):
+    """
+    Computes the clear-sky index, i.e the ratio between the measured and clear-sky GHI.
+
+    Parameters
+    ----------
+    ghi : array-like
+        The measured GHI in W/m².
+    clearsky : array-like
+        The clear-sky GHI in W/m².
+    minimum : float (OPTIONAL)
+        The clear-sky GHI under which the index is not defined (10 W/m² by default).
+
+    Returns
+    -------
+        A numpy array containing the clear-sky index (NaN where it is not defined).
+    """
+    ghi = np.asarray(ghi, dtype=float)
+    clearsky = np.asarray(clearsky, dtype=float)
+    return np.where(clearsky > minimum, ghi / np.where(clearsky > minimum, clearsky, 1), np.nan)
+
+
+def closureRatio(ghi, dni, dhi, zenith, minimum: float = 50.0):
+    """
+    Computes the closure ratio GHI / (DNI.cos(zenith) + DHI) of the three irradiance
+    components, which should be close to 1 for consistent measurements.
+
+    Parameters
+    ----------
+    ghi : array-like
+        The global horizontal irradiance in W/m².
+    dni : array-like
+        The direct normal irradiance in W/m².
+    dhi : array-like
+        The diffuse horizontal irradiance in W/m².
+    zenith : array-like
+        The solar zenith angle in degrees.
+    minimum : float (OPTIONAL)
+        The sum of the components under which the ratio is not defined (50 W/m² by default).
+
+    Returns
+    -------
+        A numpy array containing the closure ratio (NaN where it is not defined).
+    """
+    components = (np.asarray(dni, dtype=float) * np.cos(np.radians(np.asarray(zenith, dtype=float)))
+                  + np.asarray(dhi, dtype=float))
+    return np.where(components > minimum, np.asarray(ghi, dtype=float) / np.where(components > minimum, components, 1), np.nan)
+
+
+## Maximum number of instants at which the geometry is averaged over an aggregation bin
+MAX_BIN_SAMPLES = 1440
+
+
+def _binSamples(index: pd.DatetimeIndex, period):
+    ## Instants evenly spread over each bin [t, t + period), as a (bins, samples) array
+    starts = _asTimes(index)
+    ends = starts + period
+    durations = np.asarray((ends - starts).total_seconds(), dtype=float)
+    samples = int(np.clip(np.ceil(durations.max(initial=0) / 60), 1, MAX_BIN_SAMPLES))
+    fractions = (np.arange(samples) + 0.5) / samples
+    offsets = (durations[:, None] * fractions[None, :] * 1e9).astype(np.int64)
+    nanoseconds = np.asarray(starts.tz_convert(None), dtype="datetime64[ns]").view(np.int64)
+    times = pd.DatetimeIndex((nanoseconds[:, None] + offsets).ravel().view("datetime64[ns]"), tz="UTC")
+    return times, (len(index), samples)
+
+
+def addSolarQuantities(
+        df: pd.DataFrame,
+        latitude: float,
+        longitude: float,
+        ghi: str = "GHI",
+        dni: str = "DNI",
+        dhi: str = "DHI",
+        period=None
+):
+    """
+    Adds the solar derived quantities to a dataframe indexed by time. The columns added
+    are 'zenith', 'E0' (extraterrestrial normal irradiance), 'TOA' (extraterrestrial
+    horizontal irradiance) and 'GHI_clearsky', plus 'kc' (clear-sky index) when the GHI
+    column exists and 'closure' when the GHI, DNI and DHI columns exist.
+    When the rows are aggregation bins (period is given), E0, TOA and GHI_clearsky are
+    averaged over each bin instead of being taken at its label, and the zenith is the
+    one of the average cosine of the zenith angle over the bin (night included as 0), so
+    that kc and closure compare mean irradiances with mean geometry.
+
+    Parameters
+    ----------
+    df : DataFrame
+        The dataframe, indexed by a DatetimeIndex.
+    latitude : float
+        The latitude of the site in degrees.
+    longitude : float
+        The longitude of the site in degrees.
+    ghi, dni, dhi : str (OPTIONAL)
+        The names of the irradiance columns.
+    period : Timedelta or DateOffset (OPTIONAL)
+        The length of the aggregation bins labelled by the index, if any.
+
+    Returns
+    -------
+        The dataframe with the new columns.
+    """
+    if period is None:
+        zenith = solarPosition(df.index, latitude, longitude)
+        df["zenith"] = zenith
+        df["E0"] = extraterrestrialIrradiance(df.index)
+        df["TOA"] = np.maximum(df["E0"].to_numpy() * np.cos(np.radians(zenith)), 0)
+        df["GHI_clearsky"] = clearSkyGhi(zenith)
+    else:
+        times, shape = _binSamples(df.index, period)
+        sample_zenith = solarPosition(times, latitude, longitude)
+        cos_zenith = np.maximum(np.cos(np.radians(sample_zenith)), 0)
+        e0 = extraterrestrialIrradiance(times)
+        zenith = np.degrees(np.arccos(cos_zenith.reshape(shape).mean(axis=1)))
+        df["zenith"] = zenith
+        df["E0"] = e0.reshape(shape).mean(axis=1)
+        df["TOA"] = (e0 * cos_zenith).reshape(shape).mean(axis=1)
+        df["GHI_clearsky"] = clearSkyGhi(sample_zenith).reshape(shape).mean(axis=1)
+    if ghi in df:
+        df["kc"] = clearSkyIndex(df[ghi].to_numpy(), df["GHI_clearsky"].to_numpy())
+        if dni in df and dhi in df:
+            df["closure"] = closureRatio(df[ghi].to_numpy(), df[dni].to_numpy(), df[dhi].to_numpy(), zenith)
+    return df
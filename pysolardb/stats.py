@@ -0,0 +1,299 @@
+import numpy as np
+import pandas as pd
+
+## Calendar buckets available to group the statistics
+BUCKETS = {
+    None: lambda dates: np.zeros(len(dates), dtype=np.int64),
+    "month": lambda dates: np.asarray(dates.month, dtype=np.int64),
+    "hour": lambda dates: np.asarray(dates.hour, dtype=np.int64),
+    "monthhour": lambda dates: np.asarray(dates.month * 100 + dates.hour, dtype=np.int64),
+    "dayofyear": lambda dates: np.asarray(dates.dayofyear, dtype=np.int64)
+}
+
+
+class Moments():
+    """
+    Mergeable running count, mean, variance, min and max (Chan et al. parallel update).
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def update(self, values: np.ndarray):
+        """
+        Adds an array of values (without missing values).
+        """
+        if len(values) == 0:
+            return
+        other = Moments()
+        other.count = len(values)
+        other.mean = float(values.mean())
+        other.m2 = float(((values - other.mean) ** 2).sum())
+        other.min = float(values.min())
+        other.max = float(values.max())
+        self.merge(other)
+
+    def merge(self, other):
+        """
+        Adds the values accumulated by another Moments object.
+        """
+        if other.count == 0:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta ** 2 * self.count * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def std(self):
+        return np.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else np.nan
+
+
+class Histogram():
+    """
+    Mergeable histogram with fixed bin edges, counting the values below the first edge
+    and above the last one separately.
+
+    Parameters
+    ----------
+    edges : array-like
+        The edges of the bins, in increasing order.
+    """
+
+    def __init__(self, edges):
+        self.edges = np.asarray(edges, dtype=float)
+        self.counts = np.zeros(len(self.edges) - 1, dtype=np.int64)
+        self.below = 0
+        self.above = 0
+
+    def update(self, values: np.ndarray):
+        """
+        Adds an array of values (without missing values).
+        """
+        self.counts += np.histogram(values, bins=self.edges)[0]
+        self.below += int((values < self.edges[0]).sum())
+        self.above += int((values > self.edges[-1]).sum())
+
+    def merge(self, other):
+        """
+        Adds the counts of another Histogram with the same edges.
+        """
+        if not np.array_equal(self.edges, other.edges):
+            raise ValueError("Histograms with different edges cannot be merged")
+        self.counts += other.counts
+        self.below += other.below
+        self.above += other.above
+
+
+class QuantileSketch():
+    """
+    Mergeable quantile sketch in the spirit of KLL: values are kept in levels of at most
+    k items, and a full level is sorted and half of its items, picked with a random
+    offset, are promoted to the next level with a doubled weight. The memory is
+    O(k.log(n/k)) and the rank error is about log(n/k)/k.
+
+    Parameters
+    ----------
+    k : int (OPTIONAL)
+        The capacity of each level (200 by default).
+    seed : int (OPTIONAL)
+        The seed of the random offsets.
+    """
+
+    def __init__(self, k: int = 200, seed: int = None):
+        self.k = k
+        self.levels = [np.empty(0)]
+        self.__rng = np.random.default_rng(seed)
+
+    def update(self, values: np.ndarray):
+        """
+        Adds an array of values (without missing values).
+        """
+        self.levels[0] = np.concatenate((self.levels[0], np.asarray(values, dtype=float)))
+        self.__compress()
+
+    def merge(self, other):
+        """
+        Adds the values summarised by another QuantileSketch.
+        """
+        for h, level in enumerate(other.levels):
+            if h == len(self.levels):
+                self.levels.append(np.empty(0))
+            self.levels[h] = np.concatenate((self.levels[h], level))
+        self.__compress()
+
+    def __compress(self):
+        h = 0
+        while h < len(self.levels):
+            level = self.levels[h]
+            if len(level) > self.k:
+                level = np.sort(level)
+                kept = level[len(level) - len(level) % 2:]
+                pairs = level[:len(level) - len(level) % 2]
+                promoted = pairs[self.__rng.integers(2)::2]
+                if h + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                self.levels[h + 1] = np.concatenate((self.levels[h + 1], promoted))
+                self.levels[h] = kept
+            h += 1
+
+    def quantile(self, q):
+        """
+        Returns the approximate quantiles q (between 0 and 1) of the values added.
+        """
+        values = np.concatenate(self.levels)
+        if len(values) == 0:
+            return np.full(np.shape(q), np.nan)
+        weights = np.concatenate([np.full(len(level), 2.0 ** h) for h, level in enumerate(self.levels)])
+        order = np.argsort(values)
+        cumulated = np.cumsum(weights[order])
+        ranks = np.asarray(q, dtype=float) * cumulated[-1]
+        return values[order][np.minimum(np.searchsorted(cumulated, ranks), len(values) - 1)]
+
+
+class StreamingStats():
+    """
+    Out-of-core statistics per site, sensor and calendar bucket. The data is consumed
+    chunk by chunk (e.g the windows of iterData) and only the accumulators are kept, so
+    the memory does not depend on the length of the period. Statistics computed by
+    parallel workers on different sites or periods can be merged.
+
+    Parameters
+    ----------
+    by : str (OPTIONAL)
+        The calendar bucket: None (by default), 'month', 'hour', 'monthhour' or
+        'dayofyear'. See BUCKETS.
+    timezone : str (OPTIONAL)
+        The timezone used for the calendar buckets ('UTC' by default).
+    quantiles : bool (OPTIONAL)
+        This boolean, which is true by default, enables the quantile sketches.
+    k : int (OPTIONAL)
+        The capacity of the quantile sketches (see QuantileSketch).
+    edges : array-like (OPTIONAL)
+        The edges of the histograms. No histogram is kept when they are not given.
+    """
+
+    def __init__(self, by: str = None, timezone: str = "UTC", quantiles: bool = True, k: int = 200, edges=None):
+        if by not in BUCKETS:
+            raise ValueError("Unknown bucket %s, use one of %s" % (by, list(BUCKETS)))
+        self.by = by
+        self.timezone = timezone
+        self.quantiles = quantiles
+        self.k = k
+        self.edges = edges
+        self.accumulators = {}
+
+    def __accumulators(self, key):
+        if key not in self.accumulators:
+            self.accumulators[key] = {
+                "moments": Moments(),
+                "sketch": QuantileSketch(self.k) if self.quantiles else None,
+                "histogram": Histogram(self.edges) if self.edges is not None else None
+            }
+        return self.accumulators[key]
+
+    def update(self, site: str, sensor: str, dates, values):
+        """
+        Adds a chunk of values of a sensor.
+
+        Parameters
+        ----------
+        site : str
+            The alias of the site.
+        sensor : str
+            The sensor ID.
+        dates : array-like
+            The timestamps of the values.
+        values : array-like
+            The values, missing values being None or NaN.
+        """
+        dates = pd.DatetimeIndex(pd.to_datetime(dates, utc=True)).tz_convert(self.timezone)
+        values = pd.to_numeric(pd.Series(values, dtype=object), errors="coerce").to_numpy(dtype=float)
+        valid = ~np.isnan(values)
+        buckets = BUCKETS[self.by](dates)[valid]
+        values = values[valid]
+        order = np.argsort(buckets, kind="stable")
+        buckets, values = buckets[order], values[order]
+        keys, starts = np.unique(buckets, return_index=True)
+        for key, part in zip(keys, np.split(values, starts[1:])):
+            accumulators = self.__accumulators((site, sensor, int(key) if self.by is not None else None))
+            accumulators["moments"].update(part)
+            if accumulators["sketch"] is not None:
+                accumulators["sketch"].update(part)
+            if accumulators["histogram"] is not None:
+                accumulators["histogram"].update(part)
+
+    def consume(self, chunks):
+        """
+        Adds the data of several chunks.
+
+        Parameters
+        ----------
+        chunks : iterable
+            The results of getData, or the (start, stop, data) tuples of iterData.
+        """
+        for chunk in chunks:
+            data = chunk[2] if isinstance(chunk, tuple) else chunk
+            for site in data or {}:
+                for sensor, series in data[site].items():
+                    self.update(site, sensor, series["dates"], series["values"])
+        return self
+
+    def merge(self, other):
+        """
+        Adds the statistics accumulated by another StreamingStats with the same settings.
+        """
+        same_edges = (self.edges is None and other.edges is None) or (
+            self.edges is not None and other.edges is not None and np.array_equal(self.edges, other.edges)
+        )
+        if (self.by, self.timezone, self.quantiles, self.k) != (other.by, other.timezone, other.quantiles, other.k) or not same_edges:
+            raise ValueError("StreamingStats with different settings cannot be merged")
+        for key, accumulators in other.accumulators.items():
+            mine = self.__accumulators(key)
+            for name in ("moments", "sketch", "histogram"):
+                if mine[name] is not None and accumulators[name] is not None:
+                    mine[name].merge(accumulators[name])
+        return self
+
+    def result(self, q: list = (0.05, 0.25, 0.5, 0.75, 0.95)):
+        """
+        Returns the statistics.
+
+        Parameters
+        ----------
+        q : list (OPTIONAL)
+            The quantiles to compute (between 0 and 1).
+
+        Returns
+        -------
+            A pandas dataframe with one row per site, sensor and bucket and the columns
+            count, mean, std, min, max and one column per quantile (e.g 'q0.5').
+        """
+        rows = []
+        for (site, sensor, bucket), accumulators in sorted(
+                self.accumulators.items(), key=lambda item: (item[0][0], item[0][1], -1 if item[0][2] is None else item[0][2])
+        ):
+            moments = accumulators["moments"]
+            row = {
+                "site": site, "sensor": sensor, "bucket": bucket, "count": moments.count,
+                "mean": moments.mean, "std": moments.std, "min": moments.min, "max": moments.max
+            }
+            if accumulators["sketch"] is not None:
+                for quantile, value in zip(q, accumulators["sketch"].quantile(q)):
+                    row["q" + str(quantile)] = value
+            rows.append(row)
+        return pd.DataFrame(rows)
+
+    def histogram(self, site: str, sensor: str, bucket: int = None):
+        """
+        Returns the histogram of a site, sensor and bucket, or None if there is none.
+        """
+        accumulators = self.accumulators.get((site, sensor, bucket))
+        return accumulators["histogram"] if accumulators is not None else None
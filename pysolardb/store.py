@@ -0,0 +1,267 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+from .utils import parseDate, formatDate, durationToFrequency, unionIntervals
+from .encoding import encodeSeries, decodeSeries
+
+
+def _subtract(interval: tuple, covered: list):
+    ## Parts of `interval` that are not included in the sorted `covered` intervals
+    first, last = interval
+    missing = []
+    for begin, end in covered:
+        if end <= first:
+            continue
+        if begin >= last:
+            break
+        if begin > first:
+            missing.append((first, begin))
+        first = max(first, end)
+    if first < last:
+        missing.append((first, last))
+    return missing
+
+
+class LocalStore():
+    """
+    Local dataset of SolarDB raw data, partitioned by site, sensor and month. Queries take
+    the same parameters as getData and only read the partitions matching the sites,
+    sensors and time period requested, and within them only the blocks overlapping the
+    period (see encoding). Given a SolarDB client, the store first downloads the parts of
+    the period it does not hold yet.
+
+    The layout of the store directory is:
+        manifest.json                       sensor types and downloaded periods per sensor
+        <site>/<sensor>/<YYYY-MM>.sdb       one encoded series per month of data
+
+    Parameters
+    ----------
+    path : str
+        The directory of the store.
+    """
+
+    def __init__(self, path: str):
+        self.path = os.path.expanduser(path)
+        os.makedirs(self.path, exist_ok=True)
+        self.__manifest = {}
+        if os.path.exists(self.__manifestFile()):
+            with open(self.__manifestFile(), "r") as manifest:
+                self.__manifest = json.load(manifest)
+
+    def __manifestFile(self):
+        return os.path.join(self.path, "manifest.json")
+
+    def __saveManifest(self):
+        with open(self.__manifestFile(), "w") as manifest:
+            json.dump(self.__manifest, manifest, indent=1)
+
+    def __partition(self, site: str, sensor: str, month: str):
+        return os.path.join(self.path, site, sensor, month + ".sdb")
+
+    def _readPartition(self, site: str, sensor: str, month: str, first: pd.Timestamp = None, last: pd.Timestamp = None):
+        with open(self.__partition(site, sensor, month), "rb") as partition:
+            return decodeSeries(partition.read(), first, last)
+
+    def _writePartition(self, site: str, sensor: str, month: str, series: pd.Series):
+        with open(self.__partition(site, sensor, month), "wb") as partition:
+            partition.write(encodeSeries(series.index, series.to_numpy()))
+
+    def covered(self, site: str, sensor: str):
+        """
+        Returns the periods already downloaded for a sensor.
+
+        Returns
+        -------
+            A sorted list of (start, stop) UTC Timestamp tuples.
+        """
+        entry = self.__manifest.get(site, {}).get(sensor, {})
+        return [(pd.Timestamp(begin), pd.Timestamp(end)) for begin, end in entry.get("covered", [])]
+
+    def write(self, data: dict, start: str = None, stop: str = None, sensor_type: str = None):
+        """
+        Adds the result of getData to the store. The values replace the stored ones with
+        the same timestamps.
+
+        Parameters
+        ----------
+        data : dict
+            The dictionary returned by getData. The data must not be aggregated.
+        start : str (OPTIONAL)
+            The starting date of the request, recorded as downloaded with stop.
+        stop : str (OPTIONAL)
+            The ending date of the request.
+        sensor_type : str (OPTIONAL)
+            The type of the sensors of data, recorded in the manifest.
+        """
+        now = pd.Timestamp.now(tz="UTC")
+        first = parseDate(start, now) if start is not None else None
+        last = parseDate(stop if stop is not None else "now", now)
+        for site in data or {}:
+            for sensor, values in data[site].items():
+                series = pd.Series(
+                    pd.to_numeric(pd.Series(values["values"], dtype=object), errors="coerce").to_numpy(dtype=float),
+                    index=pd.DatetimeIndex(pd.to_datetime(values["dates"], utc=True), name="time"),
+                    name="value"
+                )
+                self.__writeSeries(site, sensor, series)
+                entry = self.__manifest.setdefault(site, {}).setdefault(sensor, {})
+                if sensor_type is not None:
+                    entry["type"] = sensor_type
+                if first is not None:
+                    self.markCovered(site, sensor, first, last, save=False)
+        self.__saveManifest()
+
+    def markCovered(self, site: str, sensor: str, first: pd.Timestamp, last: pd.Timestamp, save: bool = True):
+        """
+        Records a period as downloaded for a sensor, even if SolarDB had no data for it.
+        """
+        entry = self.__manifest.setdefault(site, {}).setdefault(sensor, {})
+        covered = unionIntervals(self.covered(site, sensor) + [(first, last)])
+        entry["covered"] = [[formatDate(begin), formatDate(end)] for begin, end in covered]
+        if save:
+            self.__saveManifest()
+
+    def __writeSeries(self, site: str, sensor: str, series: pd.Series):
+        if series.empty:
+            return
+        os.makedirs(os.path.dirname(self.__partition(site, sensor, "")), exist_ok=True)
+        months = series.index.strftime("%Y-%m")
+        for month in np.unique(months):
+            part = series[months == month]
+            if os.path.exists(self.__partition(site, sensor, month)):
+                stored = self._readPartition(site, sensor, month)
+                part = pd.concat([stored[~stored.index.isin(part.index)], part])
+            self._writePartition(site, sensor, month, part.sort_index())
+
+    def fill(
+            self,
+            client,
+            sites: list = None,
+            sensor_types: list = None,
+            sensors: list = None,
+            start: str = None,
+            stop: str = None
+    ):
+        """
+        Downloads from SolarDB the parts of a period that the store does not hold yet. The
+        period is restricted to the active period of each sensor (see getCoverage).
+
+        Parameters
+        ----------
+        client : SolarDB
+            The client used to reach SolarDB.
+        sites, sensor_types, sensors, start, stop :
+            The parameters of the request (see getData).
+        """
+        now = pd.Timestamp.now(tz="UTC")
+        first = parseDate(start if start is not None else "-1d", now)
+        last = parseDate(stop if stop is not None else "now", now)
+        for sensor_type in sensor_types if sensor_types is not None else [None]:
+            coverage = client.getCoverage(
+                sites=sites, sensor_types=[sensor_type] if sensor_type is not None else None, sensors=sensors
+            ) or {}
+            ## Sensors sharing the same missing periods are downloaded together
+            requests = {}
+            for site in coverage:
+                for sensor, bounds in coverage[site].items():
+                    ## The type is recorded even when nothing is missing, as the period may
+                    ## have been downloaded by an untyped request
+                    if sensor_type is not None:
+                        self.__manifest.setdefault(site, {}).setdefault(sensor, {})["type"] = sensor_type
+                    end = last if bounds["live"] else min(last, bounds["stop"] + pd.Timedelta(seconds=1))
+                    period = (max(first, bounds["start"]), end)
+                    if period[0] >= period[1]:
+                        continue
+                    for missing in _subtract(period, self.covered(site, sensor)):
+                        requests.setdefault(missing, []).append((site, sensor))
+            for (begin, end), selection in requests.items():
+                data = client.getData(
+                    sensors=[sensor for _, sensor in selection], start=formatDate(begin), stop=formatDate(end)
+                )
+                if data is None:
+                    continue
+                self.write(data, sensor_type=sensor_type)
+                for site, sensor in selection:
+                    self.markCovered(site, sensor, begin, end, save=False)
+                self.__saveManifest()
+            if sensor_type is not None:
+                self.__saveManifest()
+
+    def query(
+            self,
+            sites: list = None,
+            sensor_types: list = None,
+            sensors: list = None,
+            start: str = None,
+            stop: str = None,
+            aggrFn: str = None,
+            aggrEvery: str = None,
+            client=None,
+            asFrame: bool = False
+    ):
+        """
+        Extracts data from the store with the parameters of getData. Only the partitions
+        of the matching sites, sensors and months are read.
+
+        Parameters
+        ----------
+        sites, sensor_types, sensors, start, stop, aggrFn, aggrEvery :
+            The parameters of the request (see getData). The period is set on the last 24h
+            by default. aggrFn accepts any pandas aggregation ('mean', 'min', 'max',
+            'count', 'sum', 'median', ...).
+        client : SolarDB (OPTIONAL)
+            If given, the missing parts of the period are first downloaded with it (see
+            fill).
+        asFrame : bool (OPTIONAL)
+            This boolean, which is false by default, returns a pandas dataframe with the
+            columns site, sensor, time and value instead of a dictionary.
+
+        Returns
+        -------
+            A dictionary containing the data per site and sensor, structured as the result
+            of getData, or a pandas dataframe if asFrame is set.
+        """
+        if client is not None:
+            self.fill(client, sites=sites, sensor_types=sensor_types, sensors=sensors, start=start, stop=stop)
+        now = pd.Timestamp.now(tz="UTC")
+        first = parseDate(start if start is not None else "-1d", now)
+        last = parseDate(stop if stop is not None else "now", now)
+        frequency = durationToFrequency(aggrEvery) if aggrEvery is not None else None
+        months = pd.period_range(first.tz_localize(None), last.tz_localize(None), freq="M").strftime("%Y-%m")
+
+        result = {}
+        frames = []
+        for site in self.__manifest:
+            if sites is not None and site not in sites:
+                continue
+            for sensor, entry in self.__manifest[site].items():
+                if sensors is not None and sensor not in sensors:
+                    continue
+                if sensor_types is not None and entry.get("type") not in sensor_types:
+                    continue
+                parts = [
+                    self._readPartition(site, sensor, month, first, last) for month in months
+                    if os.path.exists(self.__partition(site, sensor, month))
+                ]
+                if not parts:
+                    continue
+                series = pd.concat(parts)
+                if aggrFn is not None and frequency is not None:
+                    series = series.resample(frequency, closed="left", label="left").agg(aggrFn)
+                elif aggrFn is not None:
+                    series = pd.Series([series.agg(aggrFn)], index=series.index[:1], name="value")
+                if series.empty:
+                    continue
+                if asFrame:
+                    frames.append(pd.DataFrame({"site": site, "sensor": sensor, "time": series.index, "value": series.to_numpy()}))
+                else:
+                    result.setdefault(site, {})[sensor] = {
+                        "dates": list(series.index.strftime("%Y-%m-%dT%H:%M:%SZ")),
+                        "values": [None if np.isnan(value) else value for value in series.to_numpy(dtype=float)]
+                    }
+        if asFrame:
+            if not frames:
+                return pd.DataFrame(columns=["site", "sensor", "time", "value"])
+            return pd.concat(frames, ignore_index=True)
+        return result
@@ -0,0 +1,152 @@
+import re
+import numpy as np
+import pandas as pd
+
+## Duration units accepted by SolarDB for the start, stop and aggrEvery parameters
+DURATION_UNITS = {
+    "y": "years",
+    "mo": "months",
+    "w": "weeks",
+    "d": "days",
+    "h": "hours",
+    "m": "minutes"
+}
+
+_duration = re.compile(r"^\s*([+-]?)(\d+)(y|mo|w|d|h|m)\s*$")
+
+
+def parseDuration(value: str):
+    """
+    Converts a SolarDB duration such as '-24d' or '1mo' into a pandas DateOffset.
+
+    Parameters
+    ----------
+    value : str
+        This string follows the '[N][T]' duration format, where [N] is an integer
+        (optionally signed) and [T] is one of the keys of DURATION_UNITS.
+
+    Returns
+    -------
+        A pandas DateOffset, or None if the string is not a duration.
+    """
+    match = _duration.match(value) if isinstance(value, str) else None
+    if match is None:
+        return None
+    sign, amount, unit = match.groups()
+    amount = -int(amount) if sign == "-" else int(amount)
+    return pd.DateOffset(**{DURATION_UNITS[unit]: amount})
+
+
+def durationToTimedelta(value: str):
+    """
+    Converts a fixed SolarDB duration ('m', 'h', 'd' or 'w' unit) into a pandas Timedelta.
+
+    Returns
+    -------
+        A pandas Timedelta, or None if the duration is not fixed (months, years) or invalid.
+    """
+    offset = parseDuration(value)
+    if offset is None:
+        return None
+    kwds = offset.kwds
+    if "years" in kwds or "months" in kwds:
+        return None
+    return pd.Timedelta(**kwds)
+
+
+def parseDate(value, now: pd.Timestamp = None):
+    """
+    Converts a SolarDB date parameter into a UTC timestamp.
+
+    Parameters
+    ----------
+    value : str
+        This string either follows a date format, an RFC3339 date format, or the duration
+        format used by SolarDB (e.g. '-24d' == 24 days ago).
+    now : Timestamp (OPTIONAL)
+        This timestamp is the reference used for relative durations (now by default).
+
+    Returns
+    -------
+        A timezone-aware pandas Timestamp, or None if the value cannot be interpreted.
+    """
+    if value is None:
+        return None
+    if now is None:
+        now = pd.Timestamp.now(tz="UTC")
+    if isinstance(value, str):
+        if value.strip() in ("now", "now()"):
+            return now
+        offset = parseDuration(value)
+        if offset is not None:
+            return now + offset
+    try:
+        ts = pd.Timestamp(value)
+    except (ValueError, TypeError):
+        return None
+    if ts is pd.NaT:
+        return None
+    if ts.tzinfo is None:
+        return ts.tz_localize("UTC")
+    return ts.tz_convert("UTC")
+
+
+def formatDate(ts: pd.Timestamp):
+    """
+    Formats a timestamp as the RFC3339 string expected by SolarDB.
+    """
+    return ts.tz_convert("UTC").strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def durationToFrequency(value: str):
+    """
+    Converts a SolarDB duration such as '10m' or '1mo' into a pandas frequency string,
+    used to resample the data.
+
+    Returns
+    -------
+        A pandas frequency string, or None if the string is not a positive duration.
+    """
+    match = _duration.match(value) if isinstance(value, str) else None
+    if match is None or match.group(1) == "-" or int(match.group(2)) == 0:
+        return None
+    frequencies = {"y": "YS", "mo": "MS", "w": "W-MON", "d": "D", "h": "h", "m": "min"}
+    return match.group(2) + frequencies[match.group(3)]
+
+
+def toNanoseconds(dates):
+    """
+    Converts timestamps into UTC nanoseconds since the epoch, whatever the resolution
+    used by pandas to store them.
+
+    Returns
+    -------
+        A numpy int64 array.
+    """
+    dates = pd.DatetimeIndex(pd.to_datetime(dates, utc=True))
+    return np.asarray(dates.tz_convert(None), dtype="datetime64[ns]").view(np.int64)
+
+
+def unionIntervals(intervals: list, tolerance=None):
+    """
+    Merges overlapping or contiguous intervals.
+
+    Parameters
+    ----------
+    intervals : list
+        The (begin, end) tuples to merge.
+    tolerance : (OPTIONAL)
+        The largest gap between two intervals for which they are still merged (no gap by
+        default).
+
+    Returns
+    -------
+        A sorted list of disjoint (begin, end) tuples.
+    """
+    merged = []
+    for begin, end in sorted(intervals):
+        if merged and (begin <= merged[-1][1] or (tolerance is not None and begin - merged[-1][1] <= tolerance)):
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((begin, end))
+    return merged
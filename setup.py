@@ -15,11 +15,15 @@ setup(
     include_package_data=True,
     packages=['pysolardb', 'pysolardb.sample'],
     install_requires=[
+        'numpy>=1.21',
         'outdated>=0.2.1',
         'pandas>=1.4.2',
         'requests>=2.25.1',
         'urllib3>=1.26.9'
     ],
+    extras_require={
+        'arrow': ['pyarrow>=7.0.0']
+    },
     long_description=long_description,
     long_description_content_type='text/markdown',
     classifiers=[